@@ -14,11 +14,12 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, is_dataclass
 from enum import Enum, auto
+from operator import attrgetter
 
 
-_bases, _dict = (ABC,), {}
+_bases, _dict = (ABC,), {"__slots__": ()}
 Block = type("Block", _bases, _dict)
 BlockItem = type("BlockItem", _bases, _dict)
 Exp = type("Exp", _bases, _dict)
@@ -62,90 +63,90 @@ class UnaryOperatorAST(Enum):
     NOT = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class ConstantAST(Exp):
     int: int
 
 
-@dataclass
+@dataclass(slots=True)
 class VarAST(Exp):
     identifier: str
 
 
-@dataclass
+@dataclass(slots=True)
 class UnaryAST(Exp):
     op: UnaryOperatorAST
     exp: Exp
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryAST(Exp):
     op: BinaryOperatorAST
     lhs: Exp
     rhs: Exp
 
 
-@dataclass
+@dataclass(slots=True)
 class AssignmentAST(Exp):
     lhs: Exp
     rhs: Exp
 
 
-@dataclass
+@dataclass(slots=True)
 class ConditionalAST(Exp):
     condition: Exp
     e1: Exp
     e2: Exp
 
 
-@dataclass
+@dataclass(slots=True)
 class FunctionCallAST(Exp):
     name: str
     args: list[Exp]
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnAST(Statement):
     exp: Exp
 
 
-@dataclass
+@dataclass(slots=True)
 class ExpressionAST(Statement):
     exp: Exp
 
 
-@dataclass
+@dataclass(slots=True)
 class IfAST(Statement):
     condition: Exp
     then: Statement
     else_: Statement | None
 
 
-@dataclass
+@dataclass(slots=True)
 class BreakAST(Statement):
     label: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ContinueAST(Statement):
     label: str
 
 
-@dataclass
+@dataclass(slots=True)
 class WhileAST(Statement):
     condition: Exp
     body: Statement
     label: str
 
 
-@dataclass
+@dataclass(slots=True)
 class DoWhileAST(Statement):
     body: Statement
     condition: Exp
     label: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ForAST(Statement):
     init: ForInit
     condition: Exp | None
@@ -154,37 +155,39 @@ class ForAST(Statement):
     label: str
 
 
-@dataclass
+@dataclass(slots=True)
 class CompoundAST(Statement):
     block: Block
 
 
 class NullAST(Statement):
+    __slots__ = ()
+
     def __eq__(self, o):
         return isinstance(o, NullAST)
 
 
-@dataclass
+@dataclass(slots=True)
 class InitDeclAST(ForInit):
     variable_declaration: VariableDeclaration
 
 
-@dataclass
+@dataclass(slots=True)
 class InitExpAST(ForInit):
     exp: Exp | None
 
 
-@dataclass
+@dataclass(slots=True)
 class BlockAST(Block):
     items: list[BlockItem]
 
 
-@dataclass
+@dataclass(slots=True)
 class SAST(BlockItem):
     statement: Statement
 
 
-@dataclass
+@dataclass(slots=True)
 class DAST(BlockItem):
     declaration: FunctionDeclaration | VariableDeclaration
 
@@ -194,7 +197,7 @@ class StorageClassAST(Enum):
     EXTERN = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class FuncDeclAST(FunctionDeclaration):
     name: str
     params: list[str]
@@ -202,14 +205,14 @@ class FuncDeclAST(FunctionDeclaration):
     storage_class: StorageClassAST | None
 
 
-@dataclass
+@dataclass(slots=True)
 class VarDeclAST(VariableDeclaration):
     name: str
     init: Exp | None
     storage_class: StorageClassAST | None
 
 
-@dataclass
+@dataclass(slots=True)
 class ProgramAST(Program):
     declarations: list[FunctionDeclaration | VariableDeclaration]
 
@@ -218,11 +221,13 @@ class ProgramAST(Program):
 
 
 class IntType(Type):
+    __slots__ = ()
+
     def __eq__(self, o):
         return isinstance(o, IntType)
 
 
-@dataclass
+@dataclass(slots=True)
 class FunType(Type):
     param_count: int
 
@@ -231,33 +236,39 @@ class FunType(Type):
 
 
 class TentativeTC(InitialValue):
+    __slots__ = ()
+
     def __eq__(self, o):
         return isinstance(o, TentativeTC)
 
 
-@dataclass
+@dataclass(slots=True)
 class InitialTC(InitialValue):
     int: int
 
 
 class NoInitializerTC(InitialValue):
+    __slots__ = ()
+
     def __eq__(self, o):
         return isinstance(o, NoInitializerTC)
 
 
-@dataclass
+@dataclass(slots=True)
 class FunAttrTC(IdentifierAttrs):
     defined: bool
     globl: bool
 
 
-@dataclass
+@dataclass(slots=True)
 class StaticAttrTC(IdentifierAttrs):
     init: InitialValue
     globl: bool
 
 
 class LocalAttrTC(IdentifierAttrs):
+    __slots__ = ()
+
     def __eq__(self, o):
         return isinstance(o, LocalAttrTC)
 
@@ -285,29 +296,35 @@ class UnaryOperatorTACKY(Enum):
     NOT = auto()
 
 
-@dataclass
+@dataclass(slots=True)
+class NameTable:
+    prefixes: list[str]
+    suffixes: list[int | str]
+
+
+@dataclass(slots=True, frozen=True)
 class ConstantTACKY(Val):
     int: int
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class VarTACKY(Val):
-    identifier: str
+    identifier: int
 
 
-@dataclass
+@dataclass(slots=True)
 class ReturnTACKY(Instruction):
     val: Val
 
 
-@dataclass
+@dataclass(slots=True)
 class UnaryTACKY(Instruction):
     op: UnaryOperatorTACKY
     src: Val
     dst: Val
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryTACKY(Instruction):
     op: BinaryOperatorTACKY
     src1: Val
@@ -315,59 +332,68 @@ class BinaryTACKY(Instruction):
     dst: Val
 
 
-@dataclass
+@dataclass(slots=True)
 class CopyTACKY(Instruction):
     src: Val
     dst: Val
 
 
-@dataclass
+@dataclass(slots=True)
 class JumpTACKY(Instruction):
-    target: str
+    target: int
 
 
-@dataclass
+@dataclass(slots=True)
 class JumpIfZeroTACKY(Instruction):
     condition: Val
-    target: str
+    target: int
 
 
-@dataclass
+@dataclass(slots=True)
 class JumpIfNotZeroTACKY(Instruction):
     condition: Val
-    target: str
+    target: int
 
 
-@dataclass
+@dataclass(slots=True)
 class LabelTACKY(Instruction):
-    identifier: str
+    identifier: int
 
 
-@dataclass
+@dataclass(slots=True)
 class FunCallTACKY(Instruction):
     fun_name: str
     args: list[Val]
     dst: Val
 
 
-@dataclass
+@dataclass(slots=True)
+class PhiTACKY(Instruction):
+    dst: Val
+    args: list[Val]
+    predecessors: list[int]
+
+
+@dataclass(slots=True)
 class FunctionTACKY(TopLevel):
     identifier: str
     globl: bool
-    params: list[str]
+    params: list[int]
     body: list[Instruction]
 
 
-@dataclass
+@dataclass(slots=True)
 class StaticVariableTACKY(TopLevel):
     identifier: str
     globl: bool
     init: int
 
 
-@dataclass
+@dataclass(slots=True)
 class ProgramTACKY(Program):
     top_level: list[TopLevel]
+    variables: NameTable
+    labels: NameTable
 
 
 # -------------------------------------------------------------------------------
@@ -394,41 +420,42 @@ class CondCodeASM(Enum):
     LE = "le"
 
 
-@dataclass
+@dataclass(slots=True)
 class ImmASM(Operand):
     int: int
 
 
-@dataclass
+@dataclass(slots=True)
 class RegisterASM(Operand):
     reg: RegASM
 
 
-@dataclass
+@dataclass(slots=True)
 class MovASM(Instruction):
     src: Operand
     dst: Operand
 
 
-@dataclass
+@dataclass(slots=True)
 class PseudoASM(Operand):
-    identifier: str
+    identifier: int
 
 
-@dataclass
+@dataclass(slots=True)
 class StackASM(Operand):
     int: int
 
 
-@dataclass
+@dataclass(slots=True)
 class DataASM(Operand):
-    identifier: str
+    identifier: int
 
 
 class BinaryOperatorASM(Enum):
     ADD = "addl"
     SUB = "subl"
     MULT = "imull"
+    SAL = "sall"
 
 
 class UnaryOperatorASM(Enum):
@@ -436,96 +463,137 @@ class UnaryOperatorASM(Enum):
     NOT = "notl"
 
 
-@dataclass
+@dataclass(slots=True)
 class UnaryASM(Instruction):
     op: UnaryOperatorASM
     operand: Operand
 
 
-@dataclass
+@dataclass(slots=True)
 class BinaryASM(Instruction):
     op: BinaryOperatorASM
     o1: Operand
     o2: Operand
 
 
-@dataclass
+@dataclass(slots=True)
+class LeaASM(Instruction):
+    base: Operand
+    index: Operand
+    scale: int
+    dst: Operand
+
+
+@dataclass(slots=True)
 class CmpASM(Instruction):
     o1: Operand
     o2: Operand
 
 
-@dataclass
+@dataclass(slots=True)
 class IdivASM(Instruction):
     operand: Operand
 
 
 class CdqASM(Instruction):
+    __slots__ = ()
+
     def __eq__(self, o):
         return isinstance(o, CdqASM)
 
 
-@dataclass
+@dataclass(slots=True)
 class JmpASM(Instruction):
-    identifier: str
+    identifier: int
 
 
-@dataclass
+@dataclass(slots=True)
 class JmpCcASM(Instruction):
     cond_code: CondCodeASM
-    identifier: str
+    identifier: int
 
 
-@dataclass
+@dataclass(slots=True)
 class SetCcASM(Instruction):
     cond_code: CondCodeASM
     operand: Operand
 
 
-@dataclass
+@dataclass(slots=True)
 class LabelASM(Instruction):
-    identifier: str
+    identifier: int
 
 
-@dataclass
+@dataclass(slots=True)
 class AllocateStackASM(Instruction):
     int: int
 
 
-@dataclass
+@dataclass(slots=True)
 class DeallocateStackASM(Instruction):
     int: int
 
 
-@dataclass
+@dataclass(slots=True)
 class PushASM(Instruction):
     operand: Operand
 
 
-@dataclass
+@dataclass(slots=True)
 class CallASM(Instruction):
     identifier: str
 
 
 class RetASM(Instruction):
+    __slots__ = ()
+
     def __eq__(self, o):
         return isinstance(o, RetASM)
 
 
-@dataclass
+@dataclass(slots=True)
 class FunctionASM(TopLevel):
     name: str
     globl: bool
     instructions: list[Instruction]
 
 
-@dataclass
+@dataclass(slots=True)
 class StaticVariableASM(TopLevel):
     name: str
     globl: bool
     init: int
 
 
-@dataclass
+@dataclass(slots=True)
 class ProgramASM(Program):
     top_level: list[TopLevel]
+    variables: NameTable
+    labels: NameTable
+
+
+# -------------------------------------------------------------------------------
+
+
+def _field_getter(cls):
+    getter = attrgetter(*(f.name for f in fields(cls)))
+    if len(fields(cls)) == 1:
+        return lambda node: (getter(node),)
+    return getter
+
+
+_FIELD_GETTERS = {
+    cls: _field_getter(cls)
+    for cls in list(globals().values())
+    if isinstance(cls, type) and is_dataclass(cls)
+}
+
+
+def clone(node):
+    cls = node.__class__
+    if cls is list:
+        return list(map(clone, node))
+    if (getter := _FIELD_GETTERS.get(cls)) is None:
+        # Enums, strings, integers and the field-less node classes.
+        return node
+    return cls(*map(clone, getter(node)))
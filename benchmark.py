@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import fields, is_dataclass
+from enum import Enum
+
+import argparse
+import asdl
+import cfg
+import codegen
+import emit
+import lexer
+import names
+import optimize
+import parser
+import resource
+import semantic_analysis
+import serialize
+import ssa
+import sys
+import tacky
+import tacky_arrays
+import time
+import visitor
+
+
+def generate_program(functions):
+    lines = []
+    for i in range(functions):
+        call = f"f{i - 1}(b, a)" if i else "0"
+        lines += (
+            f"int f{i}(int a, int b) {{",
+            f"    int x = a * {i} + b;",
+            "    for (int k = 0; k < 10; k = k + 1) {",
+            "        if (x % 3 == 0) x = x / 3; else x = x + k;",
+            "    }",
+            "    while (x > 100) x = x - 7;",
+            f"    return x ? a - b : {call};",
+            "}",
+        )
+    lines += (
+        "int main(void) {",
+        f"    return f{functions - 1}(1, 2);",
+        "}",
+    )
+    return "\n".join(lines) + "\n"
+
+
+def generate_function(statements):
+    # A single function whose body grows with statements.
+    lines = ["int main(void) {", "    int x = 1;"]
+    for i in range(statements):
+        lines += (
+            f"    if (x % 3 == {i % 3}) x = x / 3; else x = x + {i};",
+            "    while (x > 100) x = x - 7;",
+        )
+    lines += ("    return x;", "}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_variables(variables):
+    # A single function with many variables, each copied and updated in a loop.
+    lines = ["int main(void) {", "    int v0 = 1;"]
+    lines += (f"    int v{i} = v{i - 1} + {i};" for i in range(1, variables))
+    lines += ("    int k = 0;", "    while (k < 10) {")
+    lines += (
+        f"        if (v{i} % 2) v{i} = v{(i + 1) % variables} + k;"
+        for i in range(variables)
+    )
+    lines += ("        k = k + 1;", "    }", f"    return v{variables - 1};", "}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_expressions(statements):
+    # A single function recomputing the same expressions within and across
+    # the branches of ifs.
+    lines = ["int main(void) {", "    int a = 3;", "    int b = 5;", "    int x = 0;"]
+    for i in range(statements):
+        lines += (
+            f"    x = x + (a * b + {i}) * (a * b + {i});",
+            f"    if (x % 7 == 0) x = x + a * b; else x = x - (a * b + {i});",
+        )
+    lines += ("    return x;", "}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_chain(terms):
+    # A single expression adding up one variable that holds a constant.
+    return f"int main(void) {{ int a = 1; return {' + '.join(['a'] * terms)}; }}\n"
+
+
+def generate_scopes(globals_, depth):
+    # Nested blocks and for loops, each declaring a local and reading globals.
+    lines = [f"int g{i} = {i % 7};" for i in range(globals_)]
+    lines.append("int main(void) {")
+    for level in range(depth):
+        v = f"v{level}"
+        if level % 2:
+            lines.append(f"for (int {v} = 0; {v} < 1; {v} = {v} + 1) {{")
+        else:
+            lines.append(f"{{ int {v} = g{level * 7919 % globals_};")
+        lines.append(f"{v} = {v} + g{level * 104729 % globals_};")
+    lines.append("}" * depth)
+    lines.append("return 0; }")
+    return "\n".join(lines)
+
+
+def best_time(f, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def tokenize_longest_match(s):
+    tokens = []
+    while s := s.lstrip():
+        longest_length = 0
+        for pattern in lexer.TOKEN_PATTERNS.values():
+            if m := pattern.match(s):
+                match = m.group()
+                match_length = len(match)
+                if match_length > longest_length:
+                    longest = match
+                    longest_length = match_length
+        if not longest_length:
+            raise RuntimeError(f"No match found for '{s}'")
+        tokens.append(longest)
+        s = s[longest_length:]
+    return tokens
+
+
+def bench_lex(arguments):
+    print(f"{'bytes':>10} {'longest-match':>14} {'master':>10} {'speedup':>8}")
+    for functions in arguments.sizes:
+        source = generate_program(functions)
+        spellings = [str(token) for token in lexer.tokenize(source)]
+        if tokenize_longest_match(source) != spellings:
+            raise RuntimeError("Token streams differ")
+        old = best_time(tokenize_longest_match, source, repeat=1)
+        new = best_time(lexer.tokenize, source)
+        print(f"{len(source):>10} {old:>13.3f}s {new:>9.3f}s {old / new:>7.1f}x")
+
+
+def bench_parse(arguments):
+    tokens_per_function = len(lexer.tokenize(generate_program(2))) // 2
+    print(f"{'tokens':>10} {'parse':>10} {'per token':>10}")
+    for size in arguments.sizes:
+        tokens = lexer.tokenize(generate_program(size // tokens_per_function))
+        elapsed = best_time(parser.parse, tokens, repeat=arguments.repeat)
+        per_token = elapsed / len(tokens) * 1e6
+        print(f"{len(tokens):>10} {elapsed:>9.3f}s {per_token:>8.2f}us")
+
+
+def lex_and_parse(source):
+    return parser.parse(lexer.tokenize(source))
+
+
+def bench_incremental(arguments):
+    source = generate_program(arguments.functions)
+    edited = source.replace("x = x - 7;", "x = x - 8;", 1)
+    if parser.parse_incremental(source, parser.ParseCache()) != lex_and_parse(source):
+        raise RuntimeError("Incremental parse differs")
+    cache = parser.ParseCache()
+    full = best_time(lex_and_parse, edited)
+    cold = best_time(parser.parse_incremental, source, cache, repeat=1)
+    warm = best_time(parser.parse_incremental, edited, cache)
+    print(f"{len(source)} bytes in {arguments.functions + 1} declarations")
+    print(f"lex and parse        {full:.3f}s")
+    print(f"incremental, cold    {cold:.3f}s")
+    print(f"incremental, 1 edit  {warm:.3f}s ({full / warm:.1f}x)")
+
+
+def measure_nodes(tree):
+    count, size, stack = 0, 0, [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif type(node).__module__ == "asdl" and not isinstance(node, Enum):
+            count += 1
+            size += sys.getsizeof(node)
+            if hasattr(node, "__dict__"):
+                size += sys.getsizeof(node.__dict__)
+            if is_dataclass(node):
+                stack.extend(getattr(node, f.name) for f in fields(node))
+    return count, size
+
+
+def bench_memory(arguments):
+    tokens = lexer.tokenize(generate_program(arguments.functions))
+    symbols = {}
+
+    def validate(tree):
+        semantic_analysis.analyze(tree, symbols)
+        return tree
+
+    print(f"{'stage':>8} {'nodes':>9} {'bytes/node':>10} {'peak RSS':>10}")
+    tree, stages = None, []
+    for name, convert in (
+        ("parse", lambda _: parser.parse(tokens)),
+        ("validate", validate),
+        ("tacky", lambda tree: tacky.convert(tree, symbols)),
+        ("codegen", lambda tree: codegen.convert(tree, symbols)),
+    ):
+        # Keep every stage alive, as the driver does.
+        stages.append(tree := convert(tree))
+        count, size = measure_nodes(tree)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{name:>8} {count:>9} {size / count:>10.1f} {rss:>8.1f}MB")
+
+
+def bench_scopes(arguments):
+    print(f"{'globals':>8} {'depth':>6} {'resolve':>9}")
+    for globals_ in arguments.globals:
+        for depth in arguments.depth:
+            tokens = lexer.tokenize(generate_scopes(globals_, depth))
+
+            def resolve(tokens):
+                declarations = parser.parse(tokens).declarations
+                start = time.perf_counter()
+                semantic_analysis.identifier_resolution(declarations)
+                return time.perf_counter() - start
+
+            elapsed = min(resolve(tokens) for _ in range(3))
+            print(f"{globals_:>8} {depth:>6} {elapsed * 1000:>7.2f}ms")
+
+
+def bench_analyze(arguments):
+    tokens = lexer.tokenize(generate_program(arguments.functions))
+
+    def analyze(fused):
+        tree, symbols = parser.parse(tokens), {}
+        start = time.perf_counter()
+        semantic_analysis.analyze(tree, symbols, fused)
+        return time.perf_counter() - start, tree, symbols
+
+    if analyze(False)[1:] != analyze(True)[1:]:
+        raise RuntimeError("Fused analysis differs")
+    separate = min(analyze(False)[0] for _ in range(arguments.repeat))
+    fused = min(analyze(True)[0] for _ in range(arguments.repeat))
+    print(f"three walks  {separate:.3f}s")
+    print(f"fused        {fused:.3f}s ({separate / fused:.2f}x)")
+
+
+def run_to(source, stage):
+    tree, symbols = lex_and_parse(source), {}
+    if stage != "parse":
+        semantic_analysis.analyze(tree, symbols)
+    if stage in ("tacky", "codegen"):
+        tree = tacky.convert(tree, symbols)
+    if stage == "codegen":
+        tree = codegen.convert(tree, symbols)
+    return tree, symbols
+
+
+def bench_stages(arguments):
+    source = generate_program(arguments.functions)
+    print(f"{'stage':>8} {'bytes':>9} {'compile':>8} {'load':>8}")
+    for stage in ("parse", "validate", "tacky", "codegen"):
+        data = serialize.dumps(stage, *run_to(source, stage))
+        if serialize.loads(data)[1:] != run_to(source, stage):
+            raise RuntimeError(f"Saved {stage} stage differs")
+        compile_time = best_time(run_to, source, stage, repeat=1)
+        load_time = best_time(serialize.loads, data)
+        print(
+            f"{stage:>8} {len(data):>9} {compile_time:>7.3f}s {load_time:>7.3f}s"
+            f" ({compile_time / load_time:.1f}x)"
+        )
+
+
+def measure_packed(function):
+    size = sum(
+        sys.getsizeof(a)
+        for a in (function.opcodes, function.src1, function.src2, function.dst)
+    )
+    size += sys.getsizeof(function.label) + sys.getsizeof(function.args)
+    size += sys.getsizeof(function.operands) + sys.getsizeof(function.strings)
+    return size + sum(map(sys.getsizeof, function.operands))
+
+
+def bench_tacky(arguments):
+    tree = lex_and_parse(generate_program(arguments.functions))
+    symbols = {}
+    semantic_analysis.analyze(tree, symbols)
+    objects = tacky.convert(tree, symbols)
+    packed = best_time(tacky_arrays.pack, objects, repeat=1)
+    instructions = sum(
+        len(f.body) for f in objects.top_level if isinstance(f, asdl.FunctionTACKY)
+    )
+    label = tacky_arrays.OPCODE[asdl.LabelTACKY, None]
+
+    def scan_objects():
+        return sum(
+            isinstance(i, asdl.LabelTACKY)
+            for f in objects.top_level
+            if isinstance(f, asdl.FunctionTACKY)
+            for i in f.body
+        )
+
+    def scan_packed(tree):
+        return sum(
+            f.opcodes.count(label)
+            for f in tree.top_level
+            if isinstance(f, tacky_arrays.PackedFunctionTACKY)
+        )
+
+    tree = tacky_arrays.pack(objects)
+    if scan_objects() != scan_packed(tree):
+        raise RuntimeError("Packed TACKY differs")
+    object_size = measure_nodes(objects)[1]
+    packed_size = sum(
+        measure_packed(f)
+        for f in tree.top_level
+        if isinstance(f, tacky_arrays.PackedFunctionTACKY)
+    )
+    print(f"{instructions} instructions, packed in {packed:.3f}s")
+    print(f"{'form':>8} {'bytes/instr':>11} {'label scan':>11}")
+    for name, size, scan in (
+        ("objects", object_size, best_time(scan_objects)),
+        ("packed", packed_size, best_time(scan_packed, tree)),
+    ):
+        print(f"{name:>8} {size / instructions:>11.1f} {scan * 1000:>9.2f}ms")
+
+
+def bench_cfg(arguments):
+    print(f"{'instrs':>8} {'blocks':>7} {'build':>8} {'flatten':>8} {'us/instr':>8}")
+    for size in arguments.sizes:
+        tree = lex_and_parse(generate_function(size))
+        symbols = {}
+        semantic_analysis.analyze(tree, symbols)
+        body = tacky.convert(tree, symbols).top_level[0].body
+        graph = cfg.CFG(body)
+        if graph.instructions() != body:
+            raise RuntimeError("Flattened CFG differs")
+        build = best_time(cfg.CFG, body)
+        flatten = best_time(graph.instructions)
+        print(
+            f"{len(body):>8} {len(graph.block_ids()):>7} {build:>7.3f}s"
+            f" {flatten:>7.3f}s {build / len(body) * 1e6:>8.2f}"
+        )
+
+
+def bench_dataflow(arguments):
+    print(f"{'vars':>6} {'instrs':>7} {'blocks':>7} {'liveness':>9} {'copies':>9}")
+    for size in arguments.sizes:
+        tree = lex_and_parse(generate_variables(size))
+        symbols = {}
+        semantic_analysis.analyze(tree, symbols)
+        program = tacky.convert(tree, symbols)
+        static = tacky.static_variables(program.variables, symbols)
+        body = program.top_level[0].body
+        graph = cfg.CFG(body)
+        liveness = best_time(optimize.Liveness, graph, static)
+        copies = best_time(optimize.ReachingCopies, graph, static)
+        print(
+            f"{size:>6} {len(body):>7} {len(graph.block_ids()):>7}"
+            f" {liveness:>8.3f}s {copies:>8.3f}s"
+        )
+
+
+def bench_ssa(arguments):
+    print(f"{'instrs':>8} {'phis':>6} {'construct':>10} {'destruct':>9} {'us':>6}")
+    for size in arguments.sizes:
+        tree = lex_and_parse(generate_variables(size))
+        symbols = {}
+        semantic_analysis.analyze(tree, symbols)
+        program = tacky.convert(tree, symbols)
+        body = program.top_level[0].body
+        context = optimize.Context(
+            tacky.static_variables(program.variables, symbols),
+            names.Interner(program.variables),
+            names.Interner(program.labels),
+        )
+        graph = cfg.CFG(body)
+        start = time.perf_counter()
+        ssa.construct(graph, context)
+        construct = time.perf_counter() - start
+        phis = sum(
+            isinstance(instruction, asdl.PhiTACKY)
+            for index in graph.block_ids()
+            for instruction in graph.blocks[index].instructions
+        )
+        start = time.perf_counter()
+        ssa.destruct(graph, context)
+        destruct = time.perf_counter() - start
+        print(
+            f"{len(body):>8} {phis:>6} {construct:>9.3f}s {destruct:>8.3f}s"
+            f" {(construct + destruct) / len(body) * 1e6:>6.2f}"
+        )
+
+
+def bench_values(arguments):
+    print(f"{'instrs':>8} {'scope':>10} {'binary':>7} {'time':>8}")
+    for size in arguments.sizes:
+        tree = lex_and_parse(generate_expressions(size))
+        symbols = {}
+        semantic_analysis.analyze(tree, symbols)
+        program = tacky.convert(tree, symbols)
+        body = program.top_level[0].body
+        for dominators in (False, True):
+            context = optimize.Context(
+                tacky.static_variables(program.variables, symbols),
+                names.Interner(program.variables),
+                names.Interner(program.labels),
+            )
+            graph = cfg.CFG(body[:])
+            ssa.construct(graph, context)
+            start = time.perf_counter()
+            optimize.number_values(graph, context, dominators)
+            elapsed = time.perf_counter() - start
+            binary = sum(
+                isinstance(instruction, asdl.BinaryTACKY)
+                for instruction in graph.instructions()
+            )
+            scope = "dominators" if dominators else "block"
+            print(f"{len(body):>8} {scope:>10} {binary:>7} {elapsed:>7.3f}s")
+
+
+def bench_chain(arguments):
+    print(f"{'terms':>6} {'instrs':>7} {'time':>8}")
+    for size in arguments.sizes:
+        tree = lex_and_parse(generate_chain(size))
+        symbols = {}
+        semantic_analysis.analyze(tree, symbols)
+        program = tacky.convert(tree, symbols)
+        instructions = len(program.top_level[0].body)
+        start = time.perf_counter()
+        optimize.optimize(program, symbols, {"fold_constants", "propagate_copies"})
+        elapsed = time.perf_counter() - start
+        print(f"{size:>6} {instructions:>7} {elapsed:>7.3f}s")
+
+
+class MatchChain(dict):
+    # Looks a handler up the way a match statement tries class patterns: one
+    # case after another, top to bottom.
+    def __getitem__(self, cls):
+        for case, handler in self.items():
+            if issubclass(cls, case):
+                return handler
+        return visitor.ignore
+
+
+def run_passes(tokens):
+    tree, symbols, times = parser.parse(tokens), {}, {}
+    declarations = tree.declarations
+
+    def timed(name, f, *args):
+        start = time.perf_counter()
+        result = f(*args)
+        times[name] = time.perf_counter() - start
+        return result
+
+    timed("resolve", semantic_analysis.identifier_resolution, declarations)
+    timed("type check", semantic_analysis.type_check, declarations, symbols)
+    timed("label", semantic_analysis.loop_label, declarations)
+    tree = timed("tacky", tacky.convert, tree, symbols)
+    tree = timed("codegen", codegen.convert, tree, symbols)
+    timed("emit", emit.output, tree)
+    return times
+
+
+def bench_passes(arguments):
+    tokens = lexer.tokenize(generate_program(arguments.functions))
+    visitors = (
+        semantic_analysis.RESOLVE,
+        semantic_analysis.TYPE_CHECK,
+        semantic_analysis.LOOP_LABEL,
+        tacky.CONVERT,
+        codegen.CONVERT_INSTRUCTION,
+        emit.OUTPUT_INSTRUCTION,
+        emit.OUTPUT_OPERAND,
+    )
+    tables = [v.handlers for v in visitors]
+    results = []
+    for chain in (True, False):
+        for v, table in zip(visitors, tables):
+            v.handlers = MatchChain(table) if chain else table
+        runs = [run_passes(tokens) for _ in range(arguments.repeat)]
+        results.append({name: min(run[name] for run in runs) for name in runs[0]})
+    print(f"{'pass':>10} {'chain':>8} {'table':>8}")
+    for name in results[0]:
+        chain, table = results[0][name], results[1][name]
+        print(f"{name:>10} {chain:>7.3f}s {table:>7.3f}s ({chain / table:.2f}x)")
+
+
+argument_parser = argparse.ArgumentParser()
+subparsers = argument_parser.add_subparsers(required=True)
+
+lex_parser = subparsers.add_parser(
+    "lex", help="compare the master-pattern lexer with longest-match lexing"
+)
+lex_parser.add_argument(
+    "sizes", nargs="*", type=int, default=[100, 400, 1600], help="function counts"
+)
+lex_parser.set_defaults(func=bench_lex)
+
+parse_parser = subparsers.add_parser(
+    "parse", help="show that parse time grows linearly with the token count"
+)
+parse_parser.add_argument(
+    "sizes",
+    nargs="*",
+    type=int,
+    default=[10_000, 100_000, 1_000_000],
+    help="approximate token counts",
+)
+parse_parser.add_argument("--repeat", type=int, default=3)
+parse_parser.set_defaults(func=bench_parse)
+
+incremental_parser = subparsers.add_parser(
+    "incremental", help="re-parse a program after editing one function"
+)
+incremental_parser.add_argument("--functions", type=int, default=2000)
+incremental_parser.set_defaults(func=bench_incremental)
+
+memory_parser = subparsers.add_parser(
+    "memory", help="report memory per node and peak RSS for each stage"
+)
+memory_parser.add_argument("--functions", type=int, default=2000)
+memory_parser.set_defaults(func=bench_memory)
+
+passes_parser = subparsers.add_parser(
+    "passes", help="time each pass with table and match-style dispatch"
+)
+passes_parser.add_argument("--functions", type=int, default=500)
+passes_parser.add_argument("--repeat", type=int, default=3)
+passes_parser.set_defaults(func=bench_passes)
+
+scopes_parser = subparsers.add_parser(
+    "scopes", help="resolve identifiers with many globals and deeply nested scopes"
+)
+scopes_parser.add_argument(
+    "--globals", nargs="+", type=int, default=[1_000, 10_000, 100_000]
+)
+scopes_parser.add_argument("--depth", nargs="+", type=int, default=[10, 50, 150])
+scopes_parser.set_defaults(func=bench_scopes)
+
+analyze_parser = subparsers.add_parser(
+    "analyze", help="compare separate and fused semantic analysis"
+)
+analyze_parser.add_argument("--functions", type=int, default=4000)
+analyze_parser.add_argument("--repeat", type=int, default=3)
+analyze_parser.set_defaults(func=bench_analyze)
+
+stages_parser = subparsers.add_parser(
+    "stages", help="compare loading a saved stage with compiling up to it"
+)
+stages_parser.add_argument("--functions", type=int, default=1000)
+stages_parser.set_defaults(func=bench_stages)
+
+tacky_parser = subparsers.add_parser(
+    "tacky", help="compare object and array-backed TACKY instructions"
+)
+tacky_parser.add_argument("--functions", type=int, default=2000)
+tacky_parser.set_defaults(func=bench_tacky)
+
+cfg_parser = subparsers.add_parser(
+    "cfg", help="show that CFG construction grows linearly with the function size"
+)
+cfg_parser.add_argument(
+    "sizes", nargs="*", type=int, default=[1000, 4000, 16000], help="statement counts"
+)
+cfg_parser.set_defaults(func=bench_cfg)
+
+dataflow_parser = subparsers.add_parser(
+    "dataflow", help="time liveness and reaching copies with thousands of variables"
+)
+dataflow_parser.add_argument(
+    "sizes", nargs="*", type=int, default=[1000, 2000, 4000], help="variable counts"
+)
+dataflow_parser.set_defaults(func=bench_dataflow)
+
+ssa_parser = subparsers.add_parser(
+    "ssa", help="show that SSA construction and destruction scale with function size"
+)
+ssa_parser.add_argument(
+    "sizes", nargs="*", type=int, default=[1000, 4000, 16000], help="variable counts"
+)
+ssa_parser.set_defaults(func=bench_ssa)
+
+values_parser = subparsers.add_parser(
+    "values", help="compare value numbering within blocks and over dominators"
+)
+values_parser.add_argument(
+    "sizes", nargs="*", type=int, default=[1000, 4000], help="statement counts"
+)
+values_parser.set_defaults(func=bench_values)
+
+chain_parser = subparsers.add_parser(
+    "chain", help="show that folding a chain of constants takes one round"
+)
+chain_parser.add_argument(
+    "sizes", nargs="*", type=int, default=[1000, 4000, 16000], help="term counts"
+)
+chain_parser.set_defaults(func=bench_chain)
+
+arguments = argument_parser.parse_args()
+arguments.func(arguments)
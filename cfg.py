@@ -0,0 +1,290 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass, field
+from operator import attrgetter
+
+import asdl
+import visitor
+
+# How an instruction affects control flow, and where it transfers control to.
+LABEL, JUMP, BRANCH, RETURN = range(4)
+ENTRY = 0
+
+TACKY_CONTROL = visitor.HandlerTable(
+    {
+        asdl.LabelTACKY: (LABEL, attrgetter("identifier")),
+        asdl.JumpTACKY: (JUMP, attrgetter("target")),
+        asdl.JumpIfZeroTACKY: (BRANCH, attrgetter("target")),
+        asdl.JumpIfNotZeroTACKY: (BRANCH, attrgetter("target")),
+        asdl.ReturnTACKY: (RETURN, None),
+    },
+    None,
+)
+ASM_CONTROL = visitor.HandlerTable(
+    {
+        asdl.LabelASM: (LABEL, attrgetter("identifier")),
+        asdl.JmpASM: (JUMP, attrgetter("identifier")),
+        asdl.JmpCcASM: (BRANCH, attrgetter("identifier")),
+        asdl.RetASM: (RETURN, None),
+    },
+    None,
+)
+
+
+@dataclass(slots=True)
+class BasicBlock:
+    instructions: list
+    successors: list[int] = field(default_factory=list)
+    predecessors: list[int] = field(default_factory=list)
+
+
+class CFG:
+    # Blocks are numbered in program order, between the empty ENTRY block and
+    # the empty block at exit; blocks inserted later take the next numbers
+    # and their place in order.  A removed block leaves None in its place,
+    # so the numbers of the others stay valid.
+    def __init__(self, instructions, control=TACKY_CONTROL):
+        self.control = control
+        blocks, current = [BasicBlock([])], []
+        for instruction in instructions:
+            if (entry := control[instruction.__class__]) is None:
+                current.append(instruction)
+            elif entry[0] == LABEL:
+                if current:
+                    blocks.append(BasicBlock(current))
+                current = [instruction]
+            else:
+                current.append(instruction)
+                blocks.append(BasicBlock(current))
+                current = []
+        if current:
+            blocks.append(BasicBlock(current))
+        self.exit = len(blocks)
+        blocks.append(BasicBlock([]))
+        self.blocks = blocks
+        self.order = list(range(1, self.exit))
+        self.inserted = {}
+        self.labels = {}
+        for index in self.order:
+            if (label := self.label(index)) is not None:
+                self.labels[label] = index
+        self.add_edge(ENTRY, 1)
+        for index in self.order:
+            for successor in self.targets(index):
+                self.add_edge(index, successor)
+
+    def label(self, index):
+        # The label that starts block index, if any.
+        if instructions := self.blocks[index].instructions:
+            entry = self.control[instructions[0].__class__]
+            if entry is not None and entry[0] == LABEL:
+                return entry[1](instructions[0])
+        return None
+
+    def targets(self, index):
+        # Where control goes after block index, from its last instruction.
+        last = self.blocks[index].instructions[-1]
+        if (entry := self.control[last.__class__]) is None or entry[0] == LABEL:
+            return (index + 1,)
+        kind, target = entry
+        if kind == RETURN:
+            return (self.exit,)
+        if kind == JUMP:
+            return (self.labels[target(last)],)
+        return self.labels[target(last)], index + 1
+
+    def add_edge(self, source, destination):
+        successors = self.blocks[source].successors
+        if destination not in successors:
+            successors.append(destination)
+            self.blocks[destination].predecessors.append(source)
+
+    def remove_edge(self, source, destination):
+        self.blocks[source].successors.remove(destination)
+        self.blocks[destination].predecessors.remove(source)
+
+    def insert_block(self, after, instructions):
+        # Places a block right after block after in program order, or first
+        # when after is ENTRY, without edges.  Blocks inserted after the same
+        # block keep the order they were inserted in.
+        index = len(self.blocks)
+        self.blocks.append(BasicBlock(instructions))
+        self.inserted.setdefault(after, []).append(index)
+        if (label := self.label(index)) is not None:
+            self.labels[label] = index
+        return index
+
+    def _merge_inserted(self):
+        inserted, order = self.inserted, []
+        stack = [*reversed(self.order), ENTRY]
+        while stack:
+            index = stack.pop()
+            if index != ENTRY:
+                order.append(index)
+            stack += reversed(inserted.pop(index, ()))
+        self.order = order
+
+    def remove_block(self, index):
+        block = self.blocks[index]
+        for successor in block.successors[:]:
+            self.remove_edge(index, successor)
+        for predecessor in block.predecessors[:]:
+            self.remove_edge(predecessor, index)
+        self.blocks[index] = None
+
+    def remove_unreachable_blocks(self):
+        reachable = self.reachable()
+        for index in self.block_ids():
+            if not reachable[index]:
+                self.remove_block(index)
+
+    def block_ids(self):
+        # The numbers of the blocks that hold instructions, in program order.
+        if self.inserted:
+            self._merge_inserted()
+        blocks = self.blocks
+        return [index for index in self.order if blocks[index] is not None]
+
+    def depth_first(self, start, edges):
+        # Blocks reachable from start along edges, in postorder, and a map of
+        # the visited blocks.
+        blocks = self.blocks
+        visited, order = bytearray(len(blocks)), []
+        visited[start] = 1
+        stack = [(start, iter(getattr(blocks[start], edges)))]
+        while stack:
+            index, children = stack[-1]
+            for child in children:
+                if not visited[child]:
+                    visited[child] = 1
+                    stack.append((child, iter(getattr(blocks[child], edges))))
+                    break
+            else:
+                stack.pop()
+                order.append(index)
+        return order, visited
+
+    def reachable(self):
+        return self.depth_first(ENTRY, "successors")[1]
+
+    def reverse_postorder(self, backward=False):
+        # Depth-first from the entry along successors, or from the exit along
+        # predecessors.  Blocks the search does not reach follow in program
+        # order, or in reverse program order when backward.
+        if backward:
+            order, visited = self.depth_first(self.exit, "predecessors")
+        else:
+            order, visited = self.depth_first(ENTRY, "successors")
+        order.reverse()
+        rest = [index for index in self.block_ids() if not visited[index]]
+        if backward:
+            rest.reverse()
+        return order + rest
+
+    def dominators(self):
+        # The immediate dominator of each reachable block, by the iterative
+        # algorithm of Cooper, Harvey and Kennedy over reverse postorder;
+        # None for unreachable blocks.  ENTRY is its own.
+        order, _ = self.depth_first(ENTRY, "successors")
+        order.reverse()
+        number = [0] * len(self.blocks)
+        for i, index in enumerate(order):
+            number[index] = i
+        idom = [None] * len(self.blocks)
+        idom[ENTRY] = ENTRY
+
+        def intersect(a, b):
+            while a != b:
+                while number[a] > number[b]:
+                    a = idom[a]
+                while number[b] > number[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for index in order[1:]:
+                new = None
+                for p in self.blocks[index].predecessors:
+                    if idom[p] is not None:
+                        new = p if new is None else intersect(p, new)
+                if idom[index] != new:
+                    idom[index] = new
+                    changed = True
+        return idom
+
+    def instructions(self):
+        blocks = self.blocks
+        return [
+            instruction
+            for index in self.block_ids()
+            for instruction in blocks[index].instructions
+        ]
+
+
+def dominator_tree(idom):
+    children = [[] for _ in idom]
+    for index, parent in enumerate(idom):
+        if parent is not None and parent != index:
+            children[parent].append(index)
+    return children
+
+
+def dominance_frontiers(graph, idom):
+    frontiers = [set() for _ in idom]
+    for index, block in enumerate(graph.blocks):
+        if block is None or idom[index] is None or len(block.predecessors) < 2:
+            continue
+        for runner in block.predecessors:
+            while idom[runner] is not None and runner != idom[index]:
+                frontiers[runner].add(index)
+                runner = idom[runner]
+    return frontiers
+
+
+def natural_loops(graph, idom):
+    # The blocks of each loop, by header: an edge to a block that dominates
+    # its source goes back to the header, and the loop holds the blocks that
+    # reach that edge without passing the header.
+    children = dominator_tree(idom)
+    # Numbered in preorder over the dominator tree, a block dominates the
+    # blocks from its own number up to before its end.
+    number, end = [0] * len(idom), [0] * len(idom)
+    stack, count = [ENTRY], 0
+    while stack:
+        index = stack.pop()
+        if index < 0:
+            end[~index] = count
+            continue
+        number[index] = count
+        count += 1
+        stack.append(~index)
+        stack += children[index]
+    loops = {}
+    for index, block in enumerate(graph.blocks):
+        if block is None or idom[index] is None:
+            continue
+        for header in block.successors:
+            if not number[header] <= number[index] < end[header]:
+                continue
+            body = loops.setdefault(header, {header})
+            stack = [index]
+            while stack:
+                if (node := stack.pop()) not in body:
+                    body.add(node)
+                    stack += graph.blocks[node].predecessors
+    return loops
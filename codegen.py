@@ -14,6 +14,9 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import asdl
+import tacky
+import tacky_arrays
+import visitor
 
 ARG_REGISTERS = (
     asdl.RegASM.DI,
@@ -28,23 +31,29 @@ NUM_ARGS_IN_REGISTERS = len(ARG_REGISTERS)
 
 def convert(tree, symbols):
     tree = convert_program(tree)
+    # Locals and temporaries belong to a single function, so one table of
+    # offsets indexed by id serves the whole program.
+    static = tacky.static_variables(tree.variables, symbols)
+    offsets = [0] * len(static)
     for item in tree.top_level:
         match item:
             case asdl.FunctionASM(_, _, instructions):
-                stack_offset = replace_pseudoregisters(instructions, symbols)
+                stack_offset = replace_pseudoregisters(instructions, static, offsets)
                 fix_instructions(instructions, stack_offset)
     return tree
 
 
 def convert_program(tree):
-    return asdl.ProgramASM(convert_top_level(tree.top_level))
+    return asdl.ProgramASM(
+        convert_top_level(tree.top_level), tree.variables, tree.labels
+    )
 
 
 def convert_top_level(top_level):
     items = []
     for item in top_level:
         match item:
-            case asdl.FunctionTACKY():
+            case asdl.FunctionTACKY() | tacky_arrays.PackedFunctionTACKY():
                 items.append(convert_function_definition(item))
             case asdl.StaticVariableTACKY():
                 items.append(convert_static_variable(item))
@@ -116,88 +125,159 @@ def convert_function_call(fc):
 def convert_instructions(tacky_instructions):
     instructions = []
     for instruction in tacky_instructions:
-        instructions.extend(convert_instruction(instruction))
+        instructions.extend(CONVERT_INSTRUCTION(instruction))
     return instructions
 
 
-def convert_instruction(tacky_instruction):
-    match tacky_instruction:
-        case asdl.ReturnTACKY(val):
+def convert_return(tacky_instruction):
+    return (
+        asdl.MovASM(
+            convert_val(tacky_instruction.val), asdl.RegisterASM(asdl.RegASM.AX)
+        ),
+        asdl.RetASM(),
+    )
+
+
+def convert_unary(tacky_instruction):
+    unop = tacky_instruction.op
+    src, dst = convert_val(tacky_instruction.src), convert_val(tacky_instruction.dst)
+    if unop == asdl.UnaryOperatorTACKY.NOT:
+        imm_0 = asdl.ImmASM(0)
+        return (
+            asdl.CmpASM(imm_0, src),
+            asdl.MovASM(imm_0, dst),
+            asdl.SetCcASM(asdl.CondCodeASM.E, dst),
+        )
+    return (
+        asdl.MovASM(src, dst),
+        asdl.UnaryASM(convert_arithmetic_operator(unop), dst),
+    )
+
+
+def convert_binary(tacky_instruction):
+    binop = tacky_instruction.op
+    src1, src2, dst = (
+        convert_val(tacky_instruction.src1),
+        convert_val(tacky_instruction.src2),
+        convert_val(tacky_instruction.dst),
+    )
+    match binop:
+        case asdl.BinaryOperatorTACKY.DIVIDE:
+            ax = asdl.RegisterASM(asdl.RegASM.AX)
             return (
-                asdl.MovASM(convert_val(val), asdl.RegisterASM(asdl.RegASM.AX)),
-                asdl.RetASM(),
+                asdl.MovASM(src1, ax),
+                asdl.CdqASM(),
+                asdl.IdivASM(src2),
+                asdl.MovASM(ax, dst),
             )
-        case asdl.UnaryTACKY(unop, src, dst):
-            src, dst = convert_val(src), convert_val(dst)
-            if unop == asdl.UnaryOperatorTACKY.NOT:
-                imm_0 = asdl.ImmASM(0)
-                return (
-                    asdl.CmpASM(imm_0, src),
-                    asdl.MovASM(imm_0, dst),
-                    asdl.SetCcASM(asdl.CondCodeASM.E, dst),
-                )
+        case asdl.BinaryOperatorTACKY.REMAINDER:
             return (
-                asdl.MovASM(src, dst),
-                asdl.UnaryASM(convert_arithmetic_operator(unop), dst),
+                asdl.MovASM(src1, asdl.RegisterASM(asdl.RegASM.AX)),
+                asdl.CdqASM(),
+                asdl.IdivASM(src2),
+                asdl.MovASM(asdl.RegisterASM(asdl.RegASM.DX), dst),
             )
-        case asdl.BinaryTACKY(binop, src1, src2, dst):
-            src1, src2, dst = (
-                convert_val(src1),
-                convert_val(src2),
-                convert_val(dst),
-            )
-            match binop:
-                case asdl.BinaryOperatorTACKY.DIVIDE:
-                    ax = asdl.RegisterASM(asdl.RegASM.AX)
-                    return (
-                        asdl.MovASM(src1, ax),
-                        asdl.CdqASM(),
-                        asdl.IdivASM(src2),
-                        asdl.MovASM(ax, dst),
-                    )
-                case asdl.BinaryOperatorTACKY.REMAINDER:
-                    return (
-                        asdl.MovASM(src1, asdl.RegisterASM(asdl.RegASM.AX)),
-                        asdl.CdqASM(),
-                        asdl.IdivASM(src2),
-                        asdl.MovASM(asdl.RegisterASM(asdl.RegASM.DX), dst),
-                    )
-                case (
-                    asdl.BinaryOperatorTACKY.EQUAL
-                    | asdl.BinaryOperatorTACKY.NOT_EQUAL
-                    | asdl.BinaryOperatorTACKY.LESS_THAN
-                    | asdl.BinaryOperatorTACKY.LESS_OR_EQUAL
-                    | asdl.BinaryOperatorTACKY.GREATER_THAN
-                    | asdl.BinaryOperatorTACKY.GREATER_OR_EQUAL
-                ):
-                    return (
-                        asdl.CmpASM(src2, src1),
-                        asdl.MovASM(asdl.ImmASM(0), dst),
-                        asdl.SetCcASM(convert_relational_operator(binop), dst),
-                    )
-                case _:
-                    return (
-                        asdl.MovASM(src1, dst),
-                        asdl.BinaryASM(convert_arithmetic_operator(binop), src2, dst),
-                    )
-        case asdl.CopyTACKY(src, dst):
-            return (asdl.MovASM(convert_val(src), convert_val(dst)),)
-        case asdl.JumpTACKY(target):
-            return (asdl.JmpASM(target),)
-        case asdl.JumpIfZeroTACKY(condition, target):
+        case (
+            asdl.BinaryOperatorTACKY.EQUAL
+            | asdl.BinaryOperatorTACKY.NOT_EQUAL
+            | asdl.BinaryOperatorTACKY.LESS_THAN
+            | asdl.BinaryOperatorTACKY.LESS_OR_EQUAL
+            | asdl.BinaryOperatorTACKY.GREATER_THAN
+            | asdl.BinaryOperatorTACKY.GREATER_OR_EQUAL
+        ):
             return (
-                asdl.CmpASM(asdl.ImmASM(0), convert_val(condition)),
-                asdl.JmpCcASM(asdl.CondCodeASM.E, target),
+                asdl.CmpASM(src2, src1),
+                asdl.MovASM(asdl.ImmASM(0), dst),
+                asdl.SetCcASM(convert_relational_operator(binop), dst),
             )
-        case asdl.JumpIfNotZeroTACKY(condition, target):
+        case asdl.BinaryOperatorTACKY.MULTIPLY if isinstance(src2, asdl.ImmASM):
+            return convert_multiply(src1, src2.int, dst)
+        case asdl.BinaryOperatorTACKY.MULTIPLY if isinstance(src1, asdl.ImmASM):
+            return convert_multiply(src2, src1.int, dst)
+        case _:
             return (
-                asdl.CmpASM(asdl.ImmASM(0), convert_val(condition)),
-                asdl.JmpCcASM(asdl.CondCodeASM.NE, target),
+                asdl.MovASM(src1, dst),
+                asdl.BinaryASM(convert_arithmetic_operator(binop), src2, dst),
+            )
+
+
+def convert_multiply(src, factor, dst):
+    # Multiplying by ±m * 2^k with m 1, 3, 5 or 9 takes a shift, an lea of
+    # the register plus 2, 4 or 8 times itself, and a negation, which are
+    # all cheaper than imull.  The 32-bit product wraps the same way.
+    factor = (factor + 2**31) % 2**32 - 2**31
+    n = abs(factor)
+    if n == 0:
+        return (asdl.MovASM(asdl.ImmASM(0), dst),)
+    shift = (n & -n).bit_length() - 1
+    odd = n >> shift
+    if odd == 1:
+        instructions = [asdl.MovASM(src, dst)]
+        if shift:
+            instructions.append(
+                asdl.BinaryASM(asdl.BinaryOperatorASM.SAL, asdl.ImmASM(shift), dst)
             )
-        case asdl.LabelTACKY(identifier):
-            return (asdl.LabelASM(identifier),)
-        case asdl.FunCallTACKY():
-            return convert_function_call(tacky_instruction)
+    elif odd in (3, 5, 9):
+        r11 = asdl.RegisterASM(asdl.RegASM.R11)
+        instructions = [asdl.MovASM(src, r11), asdl.LeaASM(r11, r11, odd - 1, r11)]
+        if shift:
+            instructions.append(
+                asdl.BinaryASM(asdl.BinaryOperatorASM.SAL, asdl.ImmASM(shift), r11)
+            )
+        instructions.append(asdl.MovASM(r11, dst))
+    else:
+        return (
+            asdl.MovASM(src, dst),
+            asdl.BinaryASM(asdl.BinaryOperatorASM.MULT, asdl.ImmASM(factor), dst),
+        )
+    if factor < 0:
+        instructions.append(asdl.UnaryASM(asdl.UnaryOperatorASM.NEG, dst))
+    return instructions
+
+
+def convert_copy(tacky_instruction):
+    return (
+        asdl.MovASM(
+            convert_val(tacky_instruction.src), convert_val(tacky_instruction.dst)
+        ),
+    )
+
+
+def convert_jump(tacky_instruction):
+    return (asdl.JmpASM(tacky_instruction.target),)
+
+
+def convert_jump_if_zero(tacky_instruction):
+    return (
+        asdl.CmpASM(asdl.ImmASM(0), convert_val(tacky_instruction.condition)),
+        asdl.JmpCcASM(asdl.CondCodeASM.E, tacky_instruction.target),
+    )
+
+
+def convert_jump_if_not_zero(tacky_instruction):
+    return (
+        asdl.CmpASM(asdl.ImmASM(0), convert_val(tacky_instruction.condition)),
+        asdl.JmpCcASM(asdl.CondCodeASM.NE, tacky_instruction.target),
+    )
+
+
+def convert_label(tacky_instruction):
+    return (asdl.LabelASM(tacky_instruction.identifier),)
+
+
+CONVERT_INSTRUCTION = visitor.Visitor(
+    {
+        asdl.ReturnTACKY: convert_return,
+        asdl.UnaryTACKY: convert_unary,
+        asdl.BinaryTACKY: convert_binary,
+        asdl.CopyTACKY: convert_copy,
+        asdl.JumpTACKY: convert_jump,
+        asdl.JumpIfZeroTACKY: convert_jump_if_zero,
+        asdl.JumpIfNotZeroTACKY: convert_jump_if_not_zero,
+        asdl.LabelTACKY: convert_label,
+        asdl.FunCallTACKY: convert_function_call,
+    }
+)
 
 
 def convert_relational_operator(operator):
@@ -240,19 +320,17 @@ def convert_arithmetic_operator(operator):
             return asdl.BinaryOperatorASM.MULT
 
 
-def replace_pseudoregisters(instructions, symbols):
+def replace_pseudoregisters(instructions, static, offsets):
     def replace(identifier):
-        if identifier not in identifiers_offsets:
-            if identifier in symbols and isinstance(
-                symbols[identifier].attrs, asdl.StaticAttrTC
-            ):
-                return asdl.DataASM(identifier)
+        if static[identifier]:
+            return asdl.DataASM(identifier)
+        if not offsets[identifier]:
             nonlocal stack_offset
             stack_offset -= 4
-            identifiers_offsets[identifier] = stack_offset
-        return asdl.StackASM(identifiers_offsets[identifier])
+            offsets[identifier] = stack_offset
+        return asdl.StackASM(offsets[identifier])
 
-    identifiers_offsets, stack_offset = {}, 0
+    stack_offset = 0
     for index, instruction in enumerate(instructions[:]):
         match instruction:
             case asdl.MovASM(src, dst):
@@ -299,14 +377,8 @@ def fix_instructions(instructions, stack_offset):
                 instructions[index].dst = r10
                 instructions.insert(index + offset, asdl.MovASM(r10, asdl.DataASM(y)))
                 offset += 1
-            case asdl.BinaryASM(op, o, asdl.StackASM(i)) | asdl.BinaryASM(
-                op, o, asdl.DataASM(i)
-            ):
-                match i:
-                    case int():
-                        dst = asdl.StackASM(i)
-                    case str():
-                        dst = asdl.DataASM(i)
+            case asdl.BinaryASM(op, o, asdl.StackASM(i) | asdl.DataASM(i) as d):
+                dst = d.__class__(i)
                 match op:
                     case asdl.BinaryOperatorASM.ADD | asdl.BinaryOperatorASM.SUB if (
                         isinstance(o, (asdl.StackASM, asdl.DataASM))
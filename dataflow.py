@@ -0,0 +1,100 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from heapq import heappop, heappush
+
+
+class Analysis:
+    # A gen/kill problem over a CFG whose sets are ints used as bitsets.
+    # Subclasses set forward and intersect, number their facts in size and
+    # define effect(instruction), which returns the (gen, kill) of one
+    # instruction: the facts after it are gen | (facts before & ~kill), in
+    # the direction of the analysis.  boundary holds at the entry of a
+    # forward analysis or the exit of a backward one.
+    forward = True
+    intersect = False
+    boundary = 0
+    size = 0
+
+    def solve(self, graph):
+        self.graph = graph
+        blocks, exit = graph.blocks, graph.exit
+        full = (1 << self.size) - 1
+        initial = full if self.intersect else 0
+        self.effects, summaries = [None] * len(blocks), [None] * len(blocks)
+        for index in graph.block_ids():
+            instructions = blocks[index].instructions
+            if not self.forward:
+                instructions = reversed(instructions)
+            effects = self.effects[index] = list(map(self.effect, instructions))
+            gen = kill = 0
+            for g, k in effects:
+                gen = g | (gen & ~k)
+                kill = (kill | k) & ~g
+            summaries[index] = gen, kill
+        # inputs[index] flows into block index and outputs[index] out of it,
+        # in the direction of the analysis.  Nothing flows out of the far end.
+        self.inputs, outputs = [initial] * len(blocks), [initial] * len(blocks)
+        if self.forward:
+            start, end, sources, targets = 0, exit, "predecessors", "successors"
+        else:
+            start, end, sources, targets = exit, 0, "successors", "predecessors"
+        outputs[start] = self.boundary
+        order = [
+            index
+            for index in graph.reverse_postorder(not self.forward)
+            if index != start and index != end
+        ]
+        position = {index: i for i, index in enumerate(order)}
+        worklist = list(range(len(order)))
+        queued = set(worklist)
+        while worklist:
+            i = heappop(worklist)
+            queued.discard(i)
+            index = order[i]
+            block = blocks[index]
+            if neighbours := getattr(block, sources):
+                facts = full if self.intersect else 0
+                for neighbour in neighbours:
+                    if self.intersect:
+                        facts &= outputs[neighbour]
+                    else:
+                        facts |= outputs[neighbour]
+            else:
+                # Only unreachable blocks have no way in.  Taking everything
+                # to hold there, as an intersection would, lets copy
+                # propagation pick a different copy on every run.
+                facts = self.boundary
+            self.inputs[index] = facts
+            gen, kill = summaries[index]
+            facts = gen | (facts & ~kill)
+            if facts != outputs[index]:
+                outputs[index] = facts
+                for neighbour in getattr(block, targets):
+                    if neighbour != end and (p := position[neighbour]) not in queued:
+                        queued.add(p)
+                        heappush(worklist, p)
+        return self
+
+    def facts(self, index):
+        # Yields the instructions of block index in the direction of the
+        # analysis, each with the facts that flow into it.
+        facts = self.inputs[index]
+        instructions = self.graph.blocks[index].instructions
+        if not self.forward:
+            instructions = reversed(instructions)
+        for instruction, (gen, kill) in zip(instructions, self.effects[index]):
+            yield instruction, facts
+            facts = gen | (facts & ~kill)
@@ -15,14 +15,17 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from collections import deque
 from pathlib import Path
 
 import argparse
 import codegen
 import emit
 import lexer
+import optimize
 import parser
 import semantic_analysis
+import serialize
 import subprocess
 import sys
 import tacky
@@ -53,6 +56,64 @@ argument_parser.add_argument(
     action=common_action,
     help="perform lexing, parsing, semantic analysis, TACKY and assembly generation, but stop before code emission",
 )
+argument_parser.add_argument(
+    "--parse-cache",
+    metavar="FILE",
+    help="reuse the parse of unchanged top-level declarations from FILE, and update it",
+)
+argument_parser.add_argument(
+    "--fused-analysis",
+    action=common_action,
+    help="resolve identifiers, type check and label loops in a single walk",
+)
+argument_parser.add_argument(
+    "--save-stage",
+    metavar="FILE",
+    help="write the program and symbol table to FILE after the last stage performed",
+)
+argument_parser.add_argument(
+    "--resume",
+    metavar="FILE",
+    help="continue compiling from a stage saved with --save-stage instead of the source; optimizations apply only to stages saved before TACKY generation",
+)
+argument_parser.add_argument(
+    "--fold-constants",
+    action=common_action,
+    help="evaluate operations on constants and constant conditions at compile time",
+)
+argument_parser.add_argument(
+    "--simplify-algebra",
+    action=common_action,
+    help="apply identities such as x + 0 = x and !(a < b) = a >= b",
+)
+argument_parser.add_argument(
+    "--eliminate-unreachable-code",
+    action=common_action,
+    help="remove unreachable blocks, jumps to the next block and unused labels",
+)
+argument_parser.add_argument(
+    "--propagate-copies",
+    action=common_action,
+    help="replace variables with the sources of the copies that reach them",
+)
+argument_parser.add_argument(
+    "--eliminate-dead-stores",
+    action=common_action,
+    help="remove instructions whose results are never read",
+)
+argument_parser.add_argument(
+    "--eliminate-common-subexpressions",
+    action=common_action,
+    help="reuse the results of operations already computed on the same values",
+)
+argument_parser.add_argument(
+    "--hoist-loop-invariants",
+    action=common_action,
+    help="compute operations that do not change in a loop once before it",
+)
+argument_parser.add_argument(
+    "--optimize", action=common_action, help="enable all TACKY optimizations"
+)
 argument_parser.add_argument(
     "-S",
     action=common_action,
@@ -64,33 +125,67 @@ argument_parser.add_argument(
     help="convert the assembly program into an object file",
 )
 arguments = argument_parser.parse_args()
+optimizations = {
+    o for o in optimize.OPTIMIZATIONS if arguments.optimize or vars(arguments)[o]
+}
 
 input_file = Path(arguments.input_file)
 
-preprocessed_file = input_file.with_suffix(".i")
-subprocess.run(("gcc", "-E", "-P", str(input_file), "-o", str(preprocessed_file)))
-with preprocessed_file.open() as f:
-    tokens = lexer.tokenize(f.read())
-preprocessed_file.unlink()
-if arguments.lex:
+
+def save_stage():
+    if arguments.save_stage:
+        serialize.save(arguments.save_stage, stage, tree, symbols)
+
+
+def stop():
+    save_stage()
     sys.exit()
 
-tree = parser.parse(tokens)
+
+if arguments.resume:
+    stage, tree, symbols = serialize.load(arguments.resume)
+    if optimizations and stage not in ("parse", "validate"):
+        argument_parser.error(
+            f"cannot apply optimizations when resuming from the {stage} stage"
+        )
+else:
+    preprocessed_file = input_file.with_suffix(".i")
+    subprocess.run(("gcc", "-E", "-P", str(input_file), "-o", str(preprocessed_file)))
+    with preprocessed_file.open("rb") as f, lexer.map_file(f) as buffer:
+        if arguments.lex:
+            deque(lexer.tokenize_stream(buffer), maxlen=0)
+        elif arguments.parse_cache:
+            cache = parser.ParseCache.load(arguments.parse_cache)
+            tree = parser.parse_incremental(buffer, cache)
+            cache.save(arguments.parse_cache)
+        else:
+            tree = parser.parse(lexer.tokenize_stream(buffer))
+    preprocessed_file.unlink()
+    if arguments.lex:
+        sys.exit()
+    stage, symbols = "parse", {}
 if arguments.parse:
-    sys.exit()
+    stop()
 
-symbols = {}
-semantic_analysis.analyze(tree, symbols)
+if stage == "parse":
+    semantic_analysis.analyze(tree, symbols, arguments.fused_analysis)
+    stage = "validate"
 if arguments.validate:
-    sys.exit()
+    stop()
 
-tree = tacky.convert(tree, symbols)
+if stage == "validate":
+    tree = tacky.convert(tree, symbols)
+    optimize.optimize(tree, symbols, optimizations)
+    stage = "tacky"
 if arguments.tacky:
-    sys.exit()
+    stop()
 
-tree = codegen.convert(tree, symbols)
+if stage == "tacky":
+    tree = codegen.convert(tree, symbols)
+    stage = "codegen"
 if arguments.codegen:
-    sys.exit()
+    stop()
+save_stage()
 
 assembly_file = input_file.with_suffix(".s")
 with assembly_file.open("w") as f:
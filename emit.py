@@ -15,7 +15,9 @@
 
 import asdl
 import io
+import names
 import platform
+import visitor
 
 _platform_system = platform.system()
 IS_LINUX = _platform_system == "Linux"
@@ -32,14 +34,14 @@ def output(tree):
 
 
 def output_program(tree, s):
-    output_top_level(tree.top_level, s)
+    output_top_level(tree.top_level, s, tree)
 
 
-def output_top_level(items, s):
+def output_top_level(items, s, program):
     for item in items:
         match item:
             case asdl.FunctionASM():
-                output_function(item, s)
+                output_function(item, s, program)
             case asdl.StaticVariableASM():
                 output_static_variable(item, s)
 
@@ -58,7 +60,7 @@ def output_global_directive(node, s):
         s.write("\n")
 
 
-def output_function(node, s):
+def output_function(node, s, program):
     output_global_directive(node, s)
     print("\t.text", file=s)
     output_name(node, s)
@@ -68,7 +70,7 @@ def output_function(node, s):
 \tmovq %rsp, %rbp""",
         file=s,
     )
-    output_instructions(node.instructions, s)
+    output_instructions(node.instructions, s, program)
 
 
 def output_static_variable(node, s):
@@ -86,86 +88,145 @@ def output_static_variable(node, s):
         print("\t.zero 4", file=s)
 
 
-def output_instructions(instructions, s):
+def output_instructions(instructions, s, program):
     for instruction in instructions:
-        output_instruction(instruction, s)
-
-
-def output_instruction(instruction, s):
-    match instruction:
-        case asdl.MovASM(src, dst):
-            s.write("\tmovl ")
-            output_operand(src, s)
-            s.write(", ")
-            output_operand(dst, s)
-            s.write("\n")
-        case asdl.UnaryASM(unop, operand):
-            s.write("\t")
-            output_unary_operator(unop, s)
-            s.write(" ")
-            output_operand(operand, s)
-            s.write("\n")
-        case asdl.BinaryASM(binop, src, dst):
-            s.write("\t")
-            output_binary_operator(binop, s)
-            s.write(" ")
-            output_operand(src, s)
-            s.write(", ")
-            output_operand(dst, s)
-            s.write("\n")
-        case asdl.CmpASM(o1, o2):
-            s.write("\tcmpl ")
-            output_operand(o1, s)
-            s.write(", ")
-            output_operand(o2, s)
-            s.write("\n")
-        case asdl.IdivASM(operand):
-            s.write("\tidivl ")
-            output_operand(operand, s)
-            s.write("\n")
-        case asdl.CdqASM():
-            print("\tcdq", file=s)
-        case asdl.JmpASM(identifier):
-            s.write("\tjmp ")
-            output_label(identifier, s)
-            s.write("\n")
-        case asdl.JmpCcASM(cond_code, identifier):
-            s.write("\tj")
-            output_cond_code(cond_code, s)
-            s.write(" ")
-            output_label(identifier, s)
-            s.write("\n")
-        case asdl.SetCcASM(cond_code, operand):
-            s.write("\tset")
-            output_cond_code(cond_code, s)
-            s.write(" ")
-            output_operand(operand, s, 1)
-            s.write("\n")
-        case asdl.LabelASM(identifier):
-            output_label(identifier, s)
-            print(":", file=s)
-        case asdl.AllocateStackASM(int):
-            print(f"\tsubq ${int}, %rsp", file=s)
-        case asdl.DeallocateStackASM(int):
-            print(f"\taddq ${int}, %rsp", file=s)
-        case asdl.PushASM(operand):
-            s.write("\tpushq ")
-            output_operand(operand, s, 8)
-            s.write("\n")
-        case asdl.CallASM(identifier):
-            if IS_LINUX:
-                name = identifier + "@PLT"
-            elif IS_MACOS:
-                name = "_" + identifier
-            print("\tcall " + name, file=s)
-        case asdl.RetASM():
-            print(
-                """\
+        OUTPUT_INSTRUCTION(instruction, s, program)
+
+
+def output_mov(instruction, s, program):
+    s.write("\tmovl ")
+    output_operand(instruction.src, s, program)
+    s.write(", ")
+    output_operand(instruction.dst, s, program)
+    s.write("\n")
+
+
+def output_unary(instruction, s, program):
+    s.write("\t")
+    output_unary_operator(instruction.op, s)
+    s.write(" ")
+    output_operand(instruction.operand, s, program)
+    s.write("\n")
+
+
+def output_binary(instruction, s, program):
+    s.write("\t")
+    output_binary_operator(instruction.op, s)
+    s.write(" ")
+    output_operand(instruction.o1, s, program)
+    s.write(", ")
+    output_operand(instruction.o2, s, program)
+    s.write("\n")
+
+
+def output_lea(instruction, s, program):
+    s.write("\tleal (")
+    output_operand(instruction.base, s, program, 8)
+    s.write(", ")
+    output_operand(instruction.index, s, program, 8)
+    s.write(f", {instruction.scale}), ")
+    output_operand(instruction.dst, s, program)
+    s.write("\n")
+
+
+def output_cmp(instruction, s, program):
+    s.write("\tcmpl ")
+    output_operand(instruction.o1, s, program)
+    s.write(", ")
+    output_operand(instruction.o2, s, program)
+    s.write("\n")
+
+
+def output_idiv(instruction, s, program):
+    s.write("\tidivl ")
+    output_operand(instruction.operand, s, program)
+    s.write("\n")
+
+
+def output_cdq(instruction, s, program):
+    print("\tcdq", file=s)
+
+
+def output_jmp(instruction, s, program):
+    s.write("\tjmp ")
+    output_label(instruction.identifier, s, program)
+    s.write("\n")
+
+
+def output_jmp_cc(instruction, s, program):
+    s.write("\tj")
+    output_cond_code(instruction.cond_code, s)
+    s.write(" ")
+    output_label(instruction.identifier, s, program)
+    s.write("\n")
+
+
+def output_set_cc(instruction, s, program):
+    s.write("\tset")
+    output_cond_code(instruction.cond_code, s)
+    s.write(" ")
+    output_operand(instruction.operand, s, program, 1)
+    s.write("\n")
+
+
+def output_label_instruction(instruction, s, program):
+    output_label(instruction.identifier, s, program)
+    print(":", file=s)
+
+
+def output_allocate_stack(instruction, s, program):
+    print(f"\tsubq ${instruction.int}, %rsp", file=s)
+
+
+def output_deallocate_stack(instruction, s, program):
+    print(f"\taddq ${instruction.int}, %rsp", file=s)
+
+
+def output_push(instruction, s, program):
+    s.write("\tpushq ")
+    output_operand(instruction.operand, s, program, 8)
+    s.write("\n")
+
+
+def output_call(instruction, s, program):
+    identifier = instruction.identifier
+    if IS_LINUX:
+        name = identifier + "@PLT"
+    elif IS_MACOS:
+        name = "_" + identifier
+    print("\tcall " + name, file=s)
+
+
+def output_ret(instruction, s, program):
+    print(
+        """\
 \tmovq %rbp, %rsp
 \tpopq %rbp
 \tret""",
-                file=s,
-            )
+        file=s,
+    )
+
+
+OUTPUT_INSTRUCTION = visitor.Visitor(
+    {
+        asdl.MovASM: output_mov,
+        asdl.UnaryASM: output_unary,
+        asdl.BinaryASM: output_binary,
+        asdl.LeaASM: output_lea,
+        asdl.CmpASM: output_cmp,
+        asdl.IdivASM: output_idiv,
+        asdl.CdqASM: output_cdq,
+        asdl.JmpASM: output_jmp,
+        asdl.JmpCcASM: output_jmp_cc,
+        asdl.SetCcASM: output_set_cc,
+        asdl.LabelASM: output_label_instruction,
+        asdl.AllocateStackASM: output_allocate_stack,
+        asdl.DeallocateStackASM: output_deallocate_stack,
+        asdl.PushASM: output_push,
+        asdl.CallASM: output_call,
+        asdl.RetASM: output_ret,
+    }
+)
 
 
 def output_unary_operator(unop, s):
@@ -176,37 +237,53 @@ output_binary_operator = output_unary_operator
 output_cond_code = output_binary_operator
 
 
-def output_operand(node, s, nbytes=4):
-    match node:
-        case asdl.ImmASM(int):
-            s.write(f"${int}")
-        case asdl.RegisterASM(asdl.RegASM.AX):
-            s.write({8: "%rax", 4: "%eax", 1: "%al"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.DX):
-            s.write({8: "%rdx", 4: "%edx", 1: "%dl"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.CX):
-            s.write({8: "%rcx", 4: "%ecx", 1: "%cl"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.DI):
-            s.write({8: "%rdi", 4: "%edi", 1: "%dil"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.SI):
-            s.write({8: "%rsi", 4: "%esi", 1: "%sil"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.R8):
-            s.write({8: "%r8", 4: "%r8d", 1: "%r8b"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.R9):
-            s.write({8: "%r9", 4: "%r9d", 1: "%r9b"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.R10):
-            s.write({8: "%r10", 4: "%r10d", 1: "%r10b"}[nbytes])
-        case asdl.RegisterASM(asdl.RegASM.R11):
-            s.write({8: "%r11", 4: "%r11d", 1: "%r11b"}[nbytes])
-        case asdl.StackASM(int):
-            s.write(f"{int}(%rbp)")
-        case asdl.DataASM(identifier):
-            if IS_MACOS:
-                s.write("_")
-            s.write(f"{identifier}(%rip)")
-
-
-def output_label(label, s):
+REGISTER_NAMES = {
+    asdl.RegASM.AX: {8: "%rax", 4: "%eax", 1: "%al"},
+    asdl.RegASM.DX: {8: "%rdx", 4: "%edx", 1: "%dl"},
+    asdl.RegASM.CX: {8: "%rcx", 4: "%ecx", 1: "%cl"},
+    asdl.RegASM.DI: {8: "%rdi", 4: "%edi", 1: "%dil"},
+    asdl.RegASM.SI: {8: "%rsi", 4: "%esi", 1: "%sil"},
+    asdl.RegASM.R8: {8: "%r8", 4: "%r8d", 1: "%r8b"},
+    asdl.RegASM.R9: {8: "%r9", 4: "%r9d", 1: "%r9b"},
+    asdl.RegASM.R10: {8: "%r10", 4: "%r10d", 1: "%r10b"},
+    asdl.RegASM.R11: {8: "%r11", 4: "%r11d", 1: "%r11b"},
+}
+
+
+def output_imm(node, s, program, nbytes):
+    s.write(f"${node.int}")
+
+
+def output_register(node, s, program, nbytes):
+    s.write(REGISTER_NAMES[node.reg][nbytes])
+
+
+def output_stack(node, s, program, nbytes):
+    s.write(f"{node.int}(%rbp)")
+
+
+def output_data(node, s, program, nbytes):
+    if IS_MACOS:
+        s.write("_")
+    s.write(f"{names.name(program.variables, node.identifier)}(%rip)")
+
+
+OUTPUT_OPERAND = visitor.Visitor(
+    {
+        asdl.ImmASM: output_imm,
+        asdl.RegisterASM: output_register,
+        asdl.StackASM: output_stack,
+        asdl.DataASM: output_data,
+    }
+)
+
+
+def output_operand(node, s, program, nbytes=4):
+    OUTPUT_OPERAND(node, s, program, nbytes)
+
+
+def output_label(label, s, program):
+    label = names.name(program.labels, label)
     if IS_LINUX:
         s.write(".L" + label)
     elif IS_MACOS:
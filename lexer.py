@@ -13,12 +13,22 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from enum import Enum
+from contextlib import contextmanager
+from enum import IntEnum
+from types import MappingProxyType
 
+import mmap
+import os
 import re
 
 
-class Token(Enum):
+class Token(IntEnum):
+    def __new__(cls, pattern):
+        value = len(cls.__members__)
+        token = int.__new__(cls, value)
+        token._value_, token.pattern = value, pattern
+        return token
+
     IDENTIFIER = r"[a-zA-Z_]\w*\b"
     CONSTANT = r"[0-9]+\b"
     INT_KEYWORD = r"int\b"
@@ -60,22 +70,105 @@ class Token(Enum):
     EXTERN_KEYWORD = r"extern\b"
 
 
-TOKEN_PATTERNS = {t: re.compile(t.value) for t in Token}
+TOKEN_PATTERNS = {t: re.compile(t.pattern) for t in Token}
+
+
+def _is_word(token):
+    return token.pattern.endswith(r"\b")
+
+
+def _spelling(token):
+    return re.sub(r"\\(.)", r"\1", token.pattern.removesuffix(r"\b"))
+
+
+SPELLINGS = MappingProxyType(
+    {t: _spelling(t) for t in Token if t not in (Token.IDENTIFIER, Token.CONSTANT)}
+)
+KEYWORDS = MappingProxyType({_spelling(t): t for t in SPELLINGS if _is_word(t)})
+PUNCTUATORS = MappingProxyType({_spelling(t): t for t in SPELLINGS if not _is_word(t)})
+_BYTES_KEYWORDS = {k.encode(): t for k, t in KEYWORDS.items()}
+_BYTES_PUNCTUATORS = {p.encode(): t for p, t in PUNCTUATORS.items()}
+
+
+def kind_table(mapping, default=None):
+    # Token kinds are dense integers, so a tuple indexed by kind is a perfect
+    # hash of the mapping.
+    return tuple(mapping.get(t, default) for t in Token)
+
+
+# Alternation takes the first branch that matches rather than the longest, so
+# longer punctuators must come before their prefixes ("--" before "-"), and the
+# identifier branch already covers every keyword.
+_PUNCTUATOR = "|".join(map(re.escape, sorted(PUNCTUATORS, key=len, reverse=True)))
+_MASTER = f"({Token.IDENTIFIER.pattern})|({Token.CONSTANT.pattern})|({_PUNCTUATOR})"
+_IDENTIFIER_GROUP, _CONSTANT_GROUP = 1, 2
+MASTER_PATTERN = re.compile(_MASTER)
+WHITESPACE_PATTERN = re.compile(r"\s*")
+# Same patterns for bytes-like input such as a memory-mapped file.
+BYTES_MASTER_PATTERN = re.compile(_MASTER.encode())
+BYTES_WHITESPACE_PATTERN = re.compile(rb"\s*")
+
+
+class Lexeme:
+    __slots__ = ("end", "kind", "start", "value")
+
+    def __init__(self, kind, start, end, value=None):
+        self.kind = kind
+        self.start = start
+        self.end = end
+        self.value = value
+
+    def __repr__(self):
+        return f"Lexeme({self.kind.name}, {self.start}, {self.end}, {self.value!r})"
+
+    def __str__(self):
+        return SPELLINGS[self.kind] if self.value is None else str(self.value)
 
 
 def tokenize(s):
-    tokens = []
-    while s := s.lstrip():
-        longest_length = 0
-        for pattern in TOKEN_PATTERNS.values():
-            if m := pattern.match(s):
-                match = m.group()
-                match_length = len(match)
-                if match_length > longest_length:
-                    longest = match
-                    longest_length = match_length
-        if not longest_length:
-            raise RuntimeError(f"No match found for '{s}'")
-        tokens.append(longest)
-        s = s[longest_length:]
-    return tokens
+    return list(tokenize_stream(s))
+
+
+def tokenize_stream(buffer, start=0, end=None):
+    if is_text := isinstance(buffer, str):
+        master, whitespace = MASTER_PATTERN, WHITESPACE_PATTERN
+        keywords, punctuators = KEYWORDS, PUNCTUATORS
+    else:
+        master, whitespace = BYTES_MASTER_PATTERN, BYTES_WHITESPACE_PATTERN
+        keywords, punctuators = _BYTES_KEYWORDS, _BYTES_PUNCTUATORS
+    match_token, skip_whitespace = master.match, whitespace.match
+    pos = start
+    if end is None:
+        end = len(buffer)
+    while (pos := skip_whitespace(buffer, pos).end()) < end:
+        if not (m := match_token(buffer, pos)):
+            raise RuntimeError(f"No match found for '{_excerpt(buffer, pos)}'")
+        text, token_end, group = m.group(), m.end(), m.lastindex
+        if group == _IDENTIFIER_GROUP:
+            if kind := keywords.get(text):
+                yield Lexeme(kind, pos, token_end)
+            else:
+                value = text if is_text else text.decode()
+                yield Lexeme(Token.IDENTIFIER, pos, token_end, value)
+        elif group == _CONSTANT_GROUP:
+            yield Lexeme(Token.CONSTANT, pos, token_end, int(text))
+        else:
+            yield Lexeme(punctuators[text], pos, token_end)
+        pos = token_end
+
+
+def _excerpt(buffer, pos):
+    excerpt = buffer[pos : pos + 80]
+    if not isinstance(excerpt, str):
+        excerpt = excerpt.decode(errors="replace")
+    return excerpt.partition("\n")[0]
+
+
+@contextmanager
+def map_file(f):
+    # mmap refuses zero-length files.
+    if not os.fstat(f.fileno()).st_size:
+        yield b""
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        yield buffer
@@ -0,0 +1,55 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asdl
+
+
+class Interner:
+    # Assigns dense integer ids to the names of a NameTable.  A name is kept
+    # as a prefix and a suffix and only spelled out by name(), so making a
+    # temporary or a label does not build a string.  Interned names have a
+    # string suffix and are shared; fresh names have a counter suffix.
+    def __init__(self, table=None):
+        self.table = asdl.NameTable([], []) if table is None else table
+        self._ids, self._counts = {}, {}
+        for id, key in enumerate(zip(self.table.prefixes, self.table.suffixes)):
+            prefix, suffix = key
+            if suffix.__class__ is str:
+                self._ids[key] = id
+            elif suffix >= self._counts.get(prefix, 0):
+                self._counts[prefix] = suffix + 1
+
+    def _append(self, prefix, suffix):
+        self.table.prefixes.append(prefix)
+        self.table.suffixes.append(suffix)
+        return len(self.table.prefixes) - 1
+
+    def intern(self, prefix, suffix=""):
+        key = (prefix, suffix)
+        if (id := self._ids.get(key)) is None:
+            id = self._ids[key] = self._append(prefix, suffix)
+        return id
+
+    def lookup(self, prefix, suffix=""):
+        return self._ids.get((prefix, suffix))
+
+    def fresh(self, prefix):
+        count = self._counts.get(prefix, 0)
+        self._counts[prefix] = count + 1
+        return self._append(prefix, count)
+
+
+def name(table, id):
+    return f"{table.prefixes[id]}{table.suffixes[id]}"
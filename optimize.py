@@ -0,0 +1,787 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from dataclasses import dataclass
+from itertools import pairwise
+
+import asdl
+import cfg
+import dataflow
+import names
+import operator
+import ssa
+import tacky
+import visitor
+
+OPTIMIZATIONS = (
+    "fold_constants",
+    "simplify_algebra",
+    "eliminate_unreachable_code",
+    "propagate_copies",
+    "eliminate_dead_stores",
+    "eliminate_common_subexpressions",
+    "hoist_loop_invariants",
+)
+INT_MIN = -(2**31)
+
+
+@dataclass(slots=True)
+class Context:
+    # What passes may need beyond a function: which variable ids are static,
+    # the interners to make new variables and labels with, and whether
+    # constants may be folded along the way.
+    static: bytearray
+    variables: names.Interner
+    labels: names.Interner
+    fold: bool = False
+
+    def new_variable(self, prefix):
+        self.static.append(0)
+        return asdl.VarTACKY(self.variables.fresh(prefix))
+
+
+def optimize(tree, symbols, optimizations):
+    context = Context(
+        tacky.static_variables(tree.variables, symbols),
+        names.Interner(tree.variables),
+        names.Interner(tree.labels),
+        "fold_constants" in optimizations,
+    )
+    for item in tree.top_level:
+        if isinstance(item, asdl.FunctionTACKY):
+            optimize_function(item, context, optimizations)
+
+
+def optimize_function(function, context, optimizations):
+    run_to_fixed_point(function, context, optimizations)
+    # Leaving SSA makes new variables each time, so passes on SSA form run
+    # once, between rounds of the others.
+    if passes := [p for name, p in SSA_PASSES if name in optimizations]:
+        graph = cfg.CFG(function.body)
+        ssa.construct(graph, context)
+        for p in passes:
+            p(graph, context)
+        ssa.destruct(graph, context)
+        function.body = graph.instructions()
+        run_to_fixed_point(function, context, optimizations)
+
+
+def run_to_fixed_point(function, context, optimizations):
+    while True:
+        body = function.body
+        if "fold_constants" in optimizations:
+            function.body = fold_constants(function.body)
+        if "simplify_algebra" in optimizations:
+            function.body = simplify_algebra(function.body)
+        passes = [p for name, p in GRAPH_PASSES if name in optimizations]
+        if passes:
+            graph = cfg.CFG(function.body)
+            for p in passes:
+                p(graph, context)
+            function.body = graph.instructions()
+        if function.body == body:
+            return
+
+
+def wrap(i):
+    return (i - INT_MIN) % 2**32 + INT_MIN
+
+
+def divide(a, b):
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def remainder(a, b):
+    return a - divide(a, b) * b
+
+
+UNARY_OPERATORS = {
+    asdl.UnaryOperatorTACKY.COMPLEMENT: operator.invert,
+    asdl.UnaryOperatorTACKY.NEGATE: operator.neg,
+    asdl.UnaryOperatorTACKY.NOT: operator.not_,
+}
+BINARY_OPERATORS = {
+    asdl.BinaryOperatorTACKY.ADD: operator.add,
+    asdl.BinaryOperatorTACKY.SUBTRACT: operator.sub,
+    asdl.BinaryOperatorTACKY.MULTIPLY: operator.mul,
+    asdl.BinaryOperatorTACKY.DIVIDE: divide,
+    asdl.BinaryOperatorTACKY.REMAINDER: remainder,
+    asdl.BinaryOperatorTACKY.EQUAL: operator.eq,
+    asdl.BinaryOperatorTACKY.NOT_EQUAL: operator.ne,
+    asdl.BinaryOperatorTACKY.LESS_THAN: operator.lt,
+    asdl.BinaryOperatorTACKY.LESS_OR_EQUAL: operator.le,
+    asdl.BinaryOperatorTACKY.GREATER_THAN: operator.gt,
+    asdl.BinaryOperatorTACKY.GREATER_OR_EQUAL: operator.ge,
+}
+DIVISION = frozenset(
+    (asdl.BinaryOperatorTACKY.DIVIDE, asdl.BinaryOperatorTACKY.REMAINDER)
+)
+
+
+def evaluate_unary(op, a):
+    return wrap(int(UNARY_OPERATORS[op](a)))
+
+
+def evaluate_binary(op, a, b):
+    # Division by zero and INT_MIN / -1 trap at run time, so they are left
+    # for the program to perform.
+    if op in DIVISION and (b == 0 or (a == INT_MIN and b == -1)):
+        return None
+    return wrap(int(BINARY_OPERATORS[op](a, b)))
+
+
+def fold_unary(instruction):
+    match instruction:
+        case asdl.UnaryTACKY(op, asdl.ConstantTACKY(a), dst):
+            return asdl.CopyTACKY(asdl.ConstantTACKY(evaluate_unary(op, wrap(a))), dst)
+    return instruction
+
+
+def fold_binary(instruction):
+    match instruction:
+        case asdl.BinaryTACKY(op, asdl.ConstantTACKY(a), asdl.ConstantTACKY(b), dst):
+            if (result := evaluate_binary(op, wrap(a), wrap(b))) is not None:
+                return asdl.CopyTACKY(asdl.ConstantTACKY(result), dst)
+    return instruction
+
+
+def fold_jump_if_zero(instruction):
+    match instruction.condition:
+        case asdl.ConstantTACKY(c):
+            return None if wrap(c) else asdl.JumpTACKY(instruction.target)
+    return instruction
+
+
+def fold_jump_if_not_zero(instruction):
+    match instruction.condition:
+        case asdl.ConstantTACKY(c):
+            return asdl.JumpTACKY(instruction.target) if wrap(c) else None
+    return instruction
+
+
+FOLD = visitor.Visitor(
+    {
+        asdl.UnaryTACKY: fold_unary,
+        asdl.BinaryTACKY: fold_binary,
+        asdl.JumpIfZeroTACKY: fold_jump_if_zero,
+        asdl.JumpIfNotZeroTACKY: fold_jump_if_not_zero,
+    },
+    visitor.keep,
+)
+
+
+def fold_constants(instructions):
+    folded = []
+    for instruction in instructions:
+        if (instruction := FOLD(instruction)) is not None:
+            folded.append(instruction)
+    return folded
+
+
+# Each comparison and the one that holds exactly when it does not.
+INVERSE = {
+    asdl.BinaryOperatorTACKY.EQUAL: asdl.BinaryOperatorTACKY.NOT_EQUAL,
+    asdl.BinaryOperatorTACKY.NOT_EQUAL: asdl.BinaryOperatorTACKY.EQUAL,
+    asdl.BinaryOperatorTACKY.LESS_THAN: asdl.BinaryOperatorTACKY.GREATER_OR_EQUAL,
+    asdl.BinaryOperatorTACKY.LESS_OR_EQUAL: asdl.BinaryOperatorTACKY.GREATER_THAN,
+    asdl.BinaryOperatorTACKY.GREATER_THAN: asdl.BinaryOperatorTACKY.LESS_OR_EQUAL,
+    asdl.BinaryOperatorTACKY.GREATER_OR_EQUAL: asdl.BinaryOperatorTACKY.LESS_THAN,
+}
+REFLEXIVE = frozenset(
+    (
+        asdl.BinaryOperatorTACKY.EQUAL,
+        asdl.BinaryOperatorTACKY.LESS_OR_EQUAL,
+        asdl.BinaryOperatorTACKY.GREATER_OR_EQUAL,
+    )
+)
+FLIP = {
+    asdl.JumpIfZeroTACKY: asdl.JumpIfNotZeroTACKY,
+    asdl.JumpIfNotZeroTACKY: asdl.JumpIfZeroTACKY,
+}
+
+
+def constant(val):
+    if val.__class__ is asdl.ConstantTACKY:
+        return wrap(val.int)
+    return None
+
+
+def negation(val, dst, defs):
+    # dst = !val, from what computed val when that was a comparison or a
+    # logical not; None otherwise.
+    match defs.get(val):
+        case asdl.BinaryTACKY(op, a, b) if op in INVERSE:
+            return asdl.BinaryTACKY(INVERSE[op], a, b, dst)
+        case asdl.UnaryTACKY(asdl.UnaryOperatorTACKY.NOT, src):
+            zero = asdl.ConstantTACKY(0)
+            return asdl.BinaryTACKY(asdl.BinaryOperatorTACKY.NOT_EQUAL, src, zero, dst)
+    return None
+
+
+def simplify_unary(instruction, defs):
+    op, src, dst = instruction.op, instruction.src, instruction.dst
+    if op == asdl.UnaryOperatorTACKY.NOT:
+        return negation(src, dst, defs) or instruction
+    match defs.get(src):
+        case asdl.UnaryTACKY(inner, x) if inner == op:
+            return asdl.CopyTACKY(x, dst)
+        case asdl.BinaryTACKY(asdl.BinaryOperatorTACKY.SUBTRACT, a, b):
+            if op == asdl.UnaryOperatorTACKY.NEGATE:
+                return asdl.BinaryTACKY(asdl.BinaryOperatorTACKY.SUBTRACT, b, a, dst)
+    return instruction
+
+
+def simplify_binary(instruction, defs):
+    # Dividing by -1 traps on INT_MIN and by a variable on 0, so of division
+    # and remainder only those by 1 go.
+    op, a, b, dst = instruction.op, instruction.src1, instruction.src2, instruction.dst
+    ca, cb = constant(a), constant(b)
+    zero = asdl.ConstantTACKY(0)
+    match op:
+        case asdl.BinaryOperatorTACKY.ADD if cb == 0:
+            return asdl.CopyTACKY(a, dst)
+        case asdl.BinaryOperatorTACKY.ADD if ca == 0:
+            return asdl.CopyTACKY(b, dst)
+        case asdl.BinaryOperatorTACKY.SUBTRACT if cb == 0:
+            return asdl.CopyTACKY(a, dst)
+        case asdl.BinaryOperatorTACKY.SUBTRACT if ca == 0:
+            return asdl.UnaryTACKY(asdl.UnaryOperatorTACKY.NEGATE, b, dst)
+        case asdl.BinaryOperatorTACKY.SUBTRACT if a == b:
+            return asdl.CopyTACKY(zero, dst)
+        case asdl.BinaryOperatorTACKY.MULTIPLY if ca == 0 or cb == 0:
+            return asdl.CopyTACKY(zero, dst)
+        case asdl.BinaryOperatorTACKY.MULTIPLY if cb == 1:
+            return asdl.CopyTACKY(a, dst)
+        case asdl.BinaryOperatorTACKY.MULTIPLY if ca == 1:
+            return asdl.CopyTACKY(b, dst)
+        case asdl.BinaryOperatorTACKY.MULTIPLY if cb == -1:
+            return asdl.UnaryTACKY(asdl.UnaryOperatorTACKY.NEGATE, a, dst)
+        case asdl.BinaryOperatorTACKY.MULTIPLY if ca == -1:
+            return asdl.UnaryTACKY(asdl.UnaryOperatorTACKY.NEGATE, b, dst)
+        case asdl.BinaryOperatorTACKY.DIVIDE if cb == 1:
+            return asdl.CopyTACKY(a, dst)
+        case asdl.BinaryOperatorTACKY.REMAINDER if cb == 1:
+            return asdl.CopyTACKY(zero, dst)
+        case _ if op in INVERSE and a == b:
+            return asdl.CopyTACKY(asdl.ConstantTACKY(int(op in REFLEXIVE)), dst)
+        case asdl.BinaryOperatorTACKY.EQUAL | asdl.BinaryOperatorTACKY.NOT_EQUAL:
+            # A truth value compared with 0 or 1 is itself or its negation.
+            if ca is not None:
+                a, cb = b, ca
+            if cb in (0, 1) and (inverse := negation(a, dst, defs)) is not None:
+                if (op == asdl.BinaryOperatorTACKY.NOT_EQUAL) == (cb == 0):
+                    return asdl.CopyTACKY(a, dst)
+                return inverse
+    return instruction
+
+
+def simplify_condition(instruction, defs):
+    # Jumps on !x, x != 0 and x == 0 test x itself.
+    cls, target = instruction.__class__, instruction.target
+    match defs.get(instruction.condition):
+        case asdl.UnaryTACKY(asdl.UnaryOperatorTACKY.NOT, x):
+            return FLIP[cls](x, target)
+        case asdl.BinaryTACKY(
+            asdl.BinaryOperatorTACKY.EQUAL | asdl.BinaryOperatorTACKY.NOT_EQUAL as op,
+            a,
+            b,
+        ) if 0 in (constant(a), constant(b)):
+            x = b if constant(a) == 0 else a
+            if op == asdl.BinaryOperatorTACKY.EQUAL:
+                cls = FLIP[cls]
+            return cls(x, target)
+    return instruction
+
+
+SIMPLIFY = visitor.Visitor(
+    {
+        asdl.UnaryTACKY: simplify_unary,
+        asdl.BinaryTACKY: simplify_binary,
+        asdl.JumpIfZeroTACKY: simplify_condition,
+        asdl.JumpIfNotZeroTACKY: simplify_condition,
+    },
+    visitor.keep,
+)
+
+
+def simplify_algebra(instructions):
+    # defs holds the unary and binary operations that computed variables
+    # since the last label, while neither they nor their operands have been
+    # written again; calls may write static variables, so they end it too.
+    simplified, defs, readers = [], {}, {}
+    for instruction in instructions:
+        cls = instruction.__class__
+        if cls is asdl.LabelTACKY or cls is asdl.FunCallTACKY:
+            defs.clear()
+            readers.clear()
+        instruction = SIMPLIFY(instruction, defs)
+        srcs, dst = tacky.operands(instruction)
+        if dst is not None:
+            defs.pop(dst, None)
+            for reader in readers.pop(dst, ()):
+                defs.pop(reader, None)
+            cls = instruction.__class__
+            if (cls is asdl.UnaryTACKY or cls is asdl.BinaryTACKY) and dst not in srcs:
+                defs[dst] = instruction
+                for val in srcs:
+                    if val.__class__ is asdl.VarTACKY:
+                        readers.setdefault(val, []).append(dst)
+        simplified.append(instruction)
+    return simplified
+
+
+def jump_target(graph, instruction):
+    entry = graph.control[instruction.__class__]
+    if entry is not None and entry[0] in (cfg.JUMP, cfg.BRANCH):
+        return entry[1](instruction)
+    return None
+
+
+def label_of(graph, instruction):
+    entry = graph.control[instruction.__class__]
+    if entry is not None and entry[0] == cfg.LABEL:
+        return entry[1](instruction)
+    return None
+
+
+def eliminate_unreachable_code(graph, context):
+    graph.remove_unreachable_blocks()
+    remove_redundant_jumps(graph)
+    remove_unused_labels(graph)
+    remove_empty_blocks(graph)
+
+
+def remove_redundant_jumps(graph):
+    # A jump to the block that follows anyway, conditional or not, only
+    # evaluates its condition, which has no effect.
+    for index, following in pairwise(graph.block_ids()):
+        instructions = graph.blocks[index].instructions
+        target = jump_target(graph, instructions[-1])
+        if target is not None and graph.labels[target] == following:
+            instructions.pop()
+
+
+def remove_unused_labels(graph):
+    blocks, targets = graph.blocks, set()
+    ids = graph.block_ids()
+    for index in ids:
+        if instructions := blocks[index].instructions:
+            targets.add(jump_target(graph, instructions[-1]))
+    for index in ids:
+        instructions = blocks[index].instructions
+        if (
+            instructions
+            and (label := label_of(graph, instructions[0])) is not None
+            and label not in targets
+        ):
+            del instructions[0]
+            del graph.labels[label]
+
+
+def remove_empty_blocks(graph):
+    # An empty block has no label, so only the block before it falls through
+    # to it, and it falls through in turn.
+    for index in graph.block_ids():
+        block = graph.blocks[index]
+        if not block.instructions:
+            (successor,) = block.successors
+            for predecessor in block.predecessors:
+                graph.add_edge(predecessor, successor)
+            graph.remove_block(index)
+
+
+def number_copies(graph):
+    copies, ids = [], {}
+    for index in graph.block_ids():
+        for instruction in graph.blocks[index].instructions:
+            if instruction.__class__ is asdl.CopyTACKY:
+                key = instruction.src, instruction.dst
+                if key not in ids:
+                    ids[key] = len(copies)
+                    copies.append(key)
+    return copies, ids
+
+
+class ReachingCopies(dataflow.Analysis):
+    # The copies dst = src that hold at each point of a function: they reach
+    # it along every path and neither side has been written since.  Bit i
+    # stands for copies[i]; a function call may write any static variable,
+    # so it kills the copies of static variables.
+    intersect = True
+
+    def __init__(self, graph, static):
+        self.copies, self.ids = number_copies(graph)
+        self.size = len(self.copies)
+        self.mentions, self.by_dst, calls = {}, {}, 0
+        for id, (src, dst) in enumerate(self.copies):
+            bit = 1 << id
+            self.by_dst[dst] = self.by_dst.get(dst, 0) | bit
+            for val in (src, dst):
+                if val.__class__ is asdl.VarTACKY:
+                    self.mentions[val] = self.mentions.get(val, 0) | bit
+                    if static[val.identifier]:
+                        calls |= bit
+        self.calls = calls
+        self.solve(graph)
+
+    def effect(self, instruction):
+        cls = instruction.__class__
+        if cls is asdl.CopyTACKY:
+            dst = instruction.dst
+            return 1 << self.ids[instruction.src, dst], self.mentions[dst]
+        if cls is asdl.UnaryTACKY or cls is asdl.BinaryTACKY or cls is asdl.PhiTACKY:
+            return 0, self.mentions.get(instruction.dst, 0)
+        if cls is asdl.FunCallTACKY:
+            return 0, self.calls | self.mentions.get(instruction.dst, 0)
+        return 0, 0
+
+    def source(self, val, copies):
+        # At most one copy to val holds at a time.
+        if copies := self.by_dst.get(val, 0) & copies:
+            return self.copies[copies.bit_length() - 1][0]
+        return val
+
+    def holds(self, src, dst, copies):
+        id = self.ids.get((src, dst))
+        return id is not None and copies >> id & 1
+
+
+def propagate_copies(graph, context):
+    # When folding, an operation left with constant operands is folded on the
+    # spot, and the constant it gives is propagated through the rest of the
+    # block, so a chain of them takes one round rather than one each.
+    analysis, static = ReachingCopies(graph, context.static), context.static
+    constants, copies = {}, 0
+
+    def source(val):
+        if (constant := constants.get(val)) is not None:
+            return constant
+        return analysis.source(val, copies)
+
+    for index in graph.block_ids():
+        instructions = []
+        constants.clear()
+        for instruction, copies in analysis.facts(index):
+            # dst = src is redundant when it or src = dst already holds.
+            if instruction.__class__ is asdl.CopyTACKY and (
+                analysis.holds(instruction.src, instruction.dst, copies)
+                or analysis.holds(instruction.dst, instruction.src, copies)
+            ):
+                continue
+            instruction = tacky.REPLACE_OPERANDS(instruction, source)
+            cls = instruction.__class__
+            if context.fold and (cls is asdl.UnaryTACKY or cls is asdl.BinaryTACKY):
+                instruction = FOLD(instruction)
+            if (dst := tacky.operands(instruction)[1]) is not None:
+                constants.pop(dst, None)
+                if (
+                    instruction.__class__ is asdl.CopyTACKY
+                    and instruction.src.__class__ is asdl.ConstantTACKY
+                    and not static[dst.identifier]
+                ):
+                    constants[dst] = instruction.src
+            instructions.append(instruction)
+        graph.blocks[index].instructions = instructions
+
+
+class Liveness(dataflow.Analysis):
+    # The variables whose values may still be read after each point of a
+    # function.  Bit bits[v] stands for variable v.  Static variables outlive
+    # the function and may be read by any function it calls.
+    forward = False
+
+    def __init__(self, graph, static):
+        self.bits, self.statics = {}, 0
+        for index in graph.block_ids():
+            for instruction in graph.blocks[index].instructions:
+                srcs, dst = tacky.operands(instruction)
+                for val in (*srcs, dst):
+                    if val.__class__ is asdl.VarTACKY and val not in self.bits:
+                        self.bits[val] = bit = 1 << len(self.bits)
+                        if static[val.identifier]:
+                            self.statics |= bit
+        self.size = len(self.bits)
+        self.boundary = self.statics
+        self.solve(graph)
+
+    def effect(self, instruction):
+        srcs, dst = tacky.operands(instruction)
+        bits, gen = self.bits, 0
+        for val in srcs:
+            gen |= bits.get(val, 0)
+        if instruction.__class__ is asdl.FunCallTACKY:
+            gen |= self.statics
+        return gen, 0 if dst is None else bits[dst]
+
+    def live(self, val, live):
+        return live & self.bits[val]
+
+
+# Instructions whose only effect is to write their destination.
+PURE = frozenset((asdl.UnaryTACKY, asdl.BinaryTACKY, asdl.CopyTACKY))
+
+
+def eliminate_dead_stores(graph, context):
+    analysis = Liveness(graph, context.static)
+    for index in graph.block_ids():
+        instructions = [
+            instruction
+            for instruction, live in analysis.facts(index)
+            if instruction.__class__ not in PURE or analysis.live(instruction.dst, live)
+        ]
+        instructions.reverse()
+        graph.blocks[index].instructions = instructions
+
+
+GRAPH_PASSES = (
+    ("eliminate_unreachable_code", eliminate_unreachable_code),
+    ("propagate_copies", propagate_copies),
+    ("eliminate_dead_stores", eliminate_dead_stores),
+)
+
+
+COMMUTATIVE = frozenset(
+    (
+        asdl.BinaryOperatorTACKY.ADD,
+        asdl.BinaryOperatorTACKY.MULTIPLY,
+        asdl.BinaryOperatorTACKY.EQUAL,
+        asdl.BinaryOperatorTACKY.NOT_EQUAL,
+    )
+)
+
+
+def operand_order(val):
+    if val.__class__ is asdl.ConstantTACKY:
+        return 0, val.int
+    return 1, val.identifier
+
+
+def number_values(graph, context, dominators=True):
+    # Value numbering on SSA form: an operation already computed into a
+    # variable becomes a copy of it, and reads of a variable holding the same
+    # value as another read that one.  Results are looked up in the blocks
+    # that dominate the current one, or only in the current block when not
+    # dominators.  Static variables change in calls, in writes and on paths
+    # from elsewhere, so operations reading them are only reused within an
+    # epoch that each of those ends.
+    static, blocks = context.static, graph.blocks
+    if dominators:
+        children = cfg.dominator_tree(graph.dominators())
+    values, table, epoch = {}, {}, 0
+
+    def value(val):
+        if val.__class__ is asdl.VarTACKY:
+            return values.get(val, val)
+        return val
+
+    def is_static(val):
+        return val.__class__ is asdl.VarTACKY and static[val.identifier]
+
+    def number(instruction, added):
+        nonlocal epoch
+        cls = instruction.__class__
+        instruction = tacky.REPLACE_OPERANDS(instruction, value)
+        if cls is asdl.FunCallTACKY:
+            epoch += 1
+        if cls is asdl.BinaryTACKY:
+            a, b = instruction.src1, instruction.src2
+            if instruction.op in COMMUTATIVE and operand_order(b) < operand_order(a):
+                a, b = b, a
+            key = instruction.op, a, b
+            reads_static = is_static(a) or is_static(b)
+        elif cls is asdl.UnaryTACKY:
+            key = instruction.op, instruction.src
+            reads_static = is_static(instruction.src)
+        elif cls is asdl.CopyTACKY:
+            # Only a copy of a static variable needs the table; any other
+            # copy gives its destination the value of its source.
+            key = None, instruction.src
+            reads_static = is_static(instruction.src)
+            if not reads_static and not static[instruction.dst.identifier]:
+                values[instruction.dst] = instruction.src
+                return instruction
+        else:
+            return instruction
+        dst = instruction.dst
+        if static[dst.identifier]:
+            epoch += 1
+            return instruction
+        if reads_static:
+            key += (epoch,)
+        if (held := table.get(key)) is not None:
+            values[dst] = held
+            return asdl.CopyTACKY(held, dst)
+        table[key] = dst
+        added.append(key)
+        return instruction
+
+    if not dominators:
+        for index in graph.block_ids():
+            block = blocks[index]
+            epoch += 1
+            block.instructions = [number(i, []) for i in block.instructions]
+            table.clear()
+        return
+    # A negative entry leaves block ~index and drops the results it added.
+    work, scopes = [cfg.ENTRY], []
+    while work:
+        index = work.pop()
+        if index < 0:
+            for key in scopes.pop():
+                del table[key]
+            continue
+        block, added = blocks[index], []
+        epoch += 1
+        block.instructions = [number(i, added) for i in block.instructions]
+        scopes.append(added)
+        work.append(~index)
+        work += children[index]
+
+
+def hoist_loop_invariants(graph, context):
+    # Moves operations whose operands do not change in a loop into a block
+    # run once before it (a preheader).  They then run even when the loop
+    # body does not, so only operations that cannot trap move, and only
+    # reads of static variables that nothing in the loop may write.
+    blocks, static = graph.blocks, context.static
+    defined, number = {}, {}
+    for i, index in enumerate(graph.reverse_postorder()):
+        number[index] = i
+        for instruction in blocks[index].instructions:
+            dst = tacky.operands(instruction)[1]
+            if dst is not None and not static[dst.identifier]:
+                defined[dst] = index
+    ids = graph.block_ids()
+    previous = dict(zip(ids, [cfg.ENTRY, *ids]))
+    loops = cfg.natural_loops(graph, graph.dominators())
+    enclosing = {}
+    for header, body in loops.items():
+        for index in body:
+            enclosing.setdefault(index, []).append(header)
+    # Inner loops first, so what leaves them can leave the outer ones too.
+    for header, body in sorted(loops.items(), key=lambda item: len(item[1])):
+        before = previous[header]
+        # A block of the loop falling through to the header would fall
+        # through to the preheader instead.
+        if before in body and header in blocks[before].successors:
+            instructions = blocks[before].instructions
+            if not instructions or instructions[-1].__class__ is not asdl.JumpTACKY:
+                continue
+        # Operands are defined before the blocks that read them in reverse
+        # postorder, except through phis, which stay.
+        order = sorted(body, key=number.__getitem__)
+        if not (hoisted := find_invariants(graph, order, defined, static)):
+            continue
+        preheader = add_preheader(graph, header, body, before, context)
+        blocks[preheader].instructions += hoisted
+        number[preheader] = number[header] - 0.5
+        previous[header] = preheader
+        for instruction in blocks[preheader].instructions:
+            if (dst := tacky.operands(instruction)[1]) is not None:
+                defined[dst] = preheader
+        enclosing[preheader] = outer = [h for h in enclosing[header] if h != header]
+        for h in outer:
+            loops[h].add(preheader)
+
+
+def find_invariants(graph, body, defined, static):
+    calls, written = False, set()
+    for index in body:
+        for instruction in graph.blocks[index].instructions:
+            if instruction.__class__ is asdl.FunCallTACKY:
+                calls = True
+            dst = tacky.operands(instruction)[1]
+            if dst is not None and static[dst.identifier]:
+                written.add(dst)
+    inside = set(body)
+
+    def invariant(val):
+        if val.__class__ is not asdl.VarTACKY:
+            return True
+        if static[val.identifier]:
+            return not calls and val not in written
+        return defined.get(val) not in inside
+
+    hoisted = []
+    for index in body:
+        block = graph.blocks[index]
+        instructions = []
+        for instruction in block.instructions:
+            cls = instruction.__class__
+            srcs, dst = tacky.operands(instruction)
+            if (
+                cls in PURE
+                and not static[dst.identifier]
+                and all(invariant(val) for val in srcs)
+                and not (cls is asdl.BinaryTACKY and may_trap(instruction))
+            ):
+                hoisted.append(instruction)
+                defined[dst] = None
+            else:
+                instructions.append(instruction)
+        block.instructions = instructions
+    return hoisted
+
+
+def may_trap(instruction):
+    if instruction.op not in DIVISION:
+        return False
+    match instruction.src2:
+        case asdl.ConstantTACKY(b):
+            return wrap(b) in (0, -1)
+    return True
+
+
+def add_preheader(graph, header, body, before, context):
+    # The preheader falls through to the header and takes over its edges
+    # from outside the loop, along with their phi arguments.
+    blocks = graph.blocks
+    outside = [p for p in blocks[header].predecessors if p not in body]
+    label = context.labels.fresh("preheader")
+    preheader = graph.insert_block(before, [asdl.LabelTACKY(label)])
+    instructions = blocks[preheader].instructions
+    start = 0 if graph.label(header) is None else 1
+    for phi in blocks[header].instructions[start:]:
+        if phi.__class__ is not asdl.PhiTACKY:
+            break
+        args = [phi.args[phi.predecessors.index(p)] for p in outside]
+        if all(arg == args[0] for arg in args):
+            arg = args[0]
+        else:
+            name = names.name(context.variables.table, phi.dst.identifier)
+            arg = context.new_variable(name + ".")
+            instructions.append(asdl.PhiTACKY(arg, args, outside[:]))
+        kept = [i for i, p in enumerate(phi.predecessors) if p not in outside]
+        phi.args = [phi.args[i] for i in kept] + [arg]
+        phi.predecessors = [phi.predecessors[i] for i in kept] + [preheader]
+    target = graph.label(header)
+    for p in outside:
+        source = blocks[p].instructions
+        if source and jump_target(graph, last := source[-1]) == target:
+            if last.__class__ is asdl.JumpTACKY:
+                source[-1] = asdl.JumpTACKY(label)
+            else:
+                source[-1] = last.__class__(last.condition, label)
+        graph.remove_edge(p, header)
+        graph.add_edge(p, preheader)
+    graph.add_edge(preheader, header)
+    return preheader
+
+
+SSA_PASSES = (
+    ("eliminate_common_subexpressions", number_values),
+    ("hoist_loop_invariants", hoist_loop_invariants),
+)
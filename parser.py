@@ -13,70 +13,254 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+from itertools import islice
+from pathlib import Path
+
 import asdl
+import hashlib
 import lexer
-
-
-PRECEDENCE = {
-    "*": 50,
-    "/": 50,
-    "%": 50,
-    "+": 45,
-    "-": 45,
-    "<": 35,
-    "<=": 35,
-    ">": 35,
-    ">=": 35,
-    "==": 30,
-    "!=": 30,
-    "&&": 10,
-    "||": 5,
-    "?": 3,
-    "=": 1,
-}
-SPECIFIER = ("int", "static", "extern")
+import pickle
+import re
+
+Token = lexer.Token
+
+PRECEDENCE = lexer.kind_table(
+    {
+        Token.MULTIPLICATION_OPERATOR: 50,
+        Token.DIVISION_OPERATOR: 50,
+        Token.REMAINDER_OPERATOR: 50,
+        Token.ADDITION_OPERATOR: 45,
+        Token.NEGATION_OPERATOR: 45,
+        Token.LESS_THAN_OPERATOR: 35,
+        Token.LESS_THAN_OR_EQUAL_TO_OPERATOR: 35,
+        Token.GREATER_THAN_OPERATOR: 35,
+        Token.GREATER_THAN_OR_EQUAL_TO_OPERATOR: 35,
+        Token.EQUAL_TO_OPERATOR: 30,
+        Token.NOT_EQUAL_TO_OPERATOR: 30,
+        Token.LOGICAL_AND_OPERATOR: 10,
+        Token.LOGICAL_OR_OPERATOR: 5,
+        Token.QUESTION_MARK_DELIMITER: 3,
+        Token.ASSIGNMENT_OPERATOR: 1,
+    },
+    -1,
+)
+BINARY_OPERATORS = lexer.kind_table(
+    {
+        Token.NEGATION_OPERATOR: asdl.BinaryOperatorAST.SUBTRACT,
+        Token.ADDITION_OPERATOR: asdl.BinaryOperatorAST.ADD,
+        Token.MULTIPLICATION_OPERATOR: asdl.BinaryOperatorAST.MULTIPLY,
+        Token.DIVISION_OPERATOR: asdl.BinaryOperatorAST.DIVIDE,
+        Token.REMAINDER_OPERATOR: asdl.BinaryOperatorAST.REMAINDER,
+        Token.LESS_THAN_OPERATOR: asdl.BinaryOperatorAST.LESS_THAN,
+        Token.LESS_THAN_OR_EQUAL_TO_OPERATOR: asdl.BinaryOperatorAST.LESS_OR_EQUAL,
+        Token.GREATER_THAN_OPERATOR: asdl.BinaryOperatorAST.GREATER_THAN,
+        Token.GREATER_THAN_OR_EQUAL_TO_OPERATOR: asdl.BinaryOperatorAST.GREATER_OR_EQUAL,
+        Token.EQUAL_TO_OPERATOR: asdl.BinaryOperatorAST.EQUAL,
+        Token.NOT_EQUAL_TO_OPERATOR: asdl.BinaryOperatorAST.NOT_EQUAL,
+        Token.LOGICAL_AND_OPERATOR: asdl.BinaryOperatorAST.AND,
+        Token.LOGICAL_OR_OPERATOR: asdl.BinaryOperatorAST.OR,
+        Token.ASSIGNMENT_OPERATOR: asdl.BinaryOperatorAST.VAR_ASSIGN,
+    }
+)
+UNARY_OPERATORS = lexer.kind_table(
+    {
+        Token.NEGATION_OPERATOR: asdl.UnaryOperatorAST.NEGATE,
+        Token.BITWISE_COMPLEMENT_OPERATOR: asdl.UnaryOperatorAST.COMPLEMENT,
+        Token.LOGICAL_NOT_OPERATOR: asdl.UnaryOperatorAST.NOT,
+    }
+)
+SPECIFIER = frozenset((Token.INT_KEYWORD, Token.STATIC_KEYWORD, Token.EXTERN_KEYWORD))
 
 
 class SyntaxError(Exception): ...
 
 
-def take_token(tokens):
-    return tokens.pop(0)
+class TokenStream:
+    # Consumed tokens of a lazily read stream are dropped in batches of this
+    # size unless a checkpoint still refers to them.
+    COMPACT_THRESHOLD = 64
 
-
-def expect(expected, tokens):
-    actual = take_token(tokens)
-    if actual != expected:
-        raise SyntaxError(f"Expected '{expected}' but got '{actual}'")
+    def __init__(self, tokens):
+        if isinstance(tokens, list):
+            self._buffer, self._source = tokens, None
+        else:
+            self._buffer, self._source = [], iter(tokens)
+        self._base = self._pos = 0
+        self._checkpoints = []
+
+    def _fill(self, index):
+        if self._source is not None:
+            self._buffer.extend(islice(self._source, index + 1 - len(self._buffer)))
+        return index < len(self._buffer)
+
+    def at_end(self):
+        return self._pos >= len(self._buffer) and not self._fill(self._pos)
+
+    def peek(self, n=0):
+        index = self._pos + n
+        if index >= len(self._buffer) and not self._fill(index):
+            raise SyntaxError("Unexpected end of input")
+        return self._buffer[index]
+
+    def advance(self):
+        token = self.peek()
+        self._pos += 1
+        if (
+            self._pos >= self.COMPACT_THRESHOLD
+            and self._source is not None
+            and not self._checkpoints
+        ):
+            del self._buffer[: self._pos]
+            self._base += self._pos
+            self._pos = 0
+        return token
+
+    def expect(self, expected):
+        actual = self.advance()
+        if actual.kind != expected:
+            raise SyntaxError(
+                f"Expected '{lexer.SPELLINGS[expected]}' but got '{actual}'"
+                f" at offset {actual.start}"
+            )
+        return actual
+
+    # The parsers here need no more than peek(n), but callers that parse
+    # speculatively can take a checkpoint, then either restore the stream to
+    # it or release it.  Checkpoints nest and end innermost first.
+    def checkpoint(self):
+        checkpoint = self._base + self._pos
+        self._checkpoints.append(checkpoint)
+        return checkpoint
+
+    def restore(self, checkpoint):
+        self.release(checkpoint)
+        self._pos = checkpoint - self._base
+
+    def release(self, checkpoint):
+        if not self._checkpoints or self._checkpoints[-1] != checkpoint:
+            raise ValueError(f"Checkpoint {checkpoint} is not the innermost one")
+        self._checkpoints.pop()
 
 
 def parse(tokens):
+    tokens = TokenStream(tokens)
     program = parse_program(tokens)
-    if tokens:
-        raise SyntaxError(f"Nonempty tokens after parsing program: {tokens}")
+    if not tokens.at_end():
+        raise SyntaxError(f"Nonempty tokens after parsing program: {tokens.peek()}")
     return program
 
 
 def parse_program(tokens):
     declarations = []
-    while tokens:
+    while not tokens.at_end():
         declarations.append(parse_declaration(tokens))
     return asdl.ProgramAST(declarations)
 
 
+class ParseCache:
+    def __init__(self, entries=None):
+        # Declarations parsed in this process, or pickled ones read from disk.
+        self._entries = entries or {}
+        self._used = {}
+
+    @staticmethod
+    def _tag():
+        # Declarations pickled by another version of the AST or the parser
+        # must not be reused.
+        h = hashlib.blake2b(digest_size=16)
+        for path in (asdl.__file__, lexer.__file__, __file__):
+            h.update(Path(path).read_bytes())
+        return h.digest()
+
+    @classmethod
+    def load(cls, path):
+        # A missing, stale or corrupt cache just means parsing from scratch.
+        try:
+            with open(path, "rb") as f:
+                tag, entries = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+            return cls()
+        return cls(entries if tag == cls._tag() else None)
+
+    def save(self, path):
+        entries = {
+            key: entry if isinstance(entry, bytes) else pickle.dumps(entry)
+            for key, entry in self._used.items()
+        }
+        with open(path, "wb") as f:
+            pickle.dump((self._tag(), entries), f, pickle.HIGHEST_PROTOCOL)
+
+    def get(self, key):
+        if (entry := self._entries.get(key)) is None:
+            return None
+        self._used[key] = entry
+        # Later passes rewrite the tree in place, so hand out a fresh copy.
+        if isinstance(entry, bytes):
+            return pickle.loads(entry)
+        return asdl.clone(entry)
+
+    def put(self, key, declaration):
+        self._entries[key] = self._used[key] = asdl.clone(declaration)
+
+
+# Braces and semicolons are never part of another token, so top-level
+# declarations can be delimited without lexing.
+_BOUNDARY_PATTERN = re.compile(r"(\{)|(\})|;")
+_BYTES_BOUNDARY_PATTERN = re.compile(_BOUNDARY_PATTERN.pattern.encode())
+_OPEN_GROUP, _CLOSE_GROUP = 1, 2
+
+
+def split_declarations(buffer):
+    if isinstance(buffer, str):
+        boundary, whitespace = _BOUNDARY_PATTERN, lexer.WHITESPACE_PATTERN
+    else:
+        boundary, whitespace = _BYTES_BOUNDARY_PATTERN, lexer.BYTES_WHITESPACE_PATTERN
+    start, depth = whitespace.match(buffer).end(), 0
+    for m in boundary.finditer(buffer):
+        group = m.lastindex
+        if group == _OPEN_GROUP:
+            depth += 1
+            continue
+        if group == _CLOSE_GROUP:
+            depth -= 1
+        if not depth:
+            yield start, m.end()
+            start = whitespace.match(buffer, m.end()).end()
+    if start < len(buffer):
+        yield start, len(buffer)
+
+
+def parse_incremental(buffer, cache):
+    declarations = []
+    for start, end in split_declarations(buffer):
+        text = buffer[start:end]
+        key = hashlib.blake2b(
+            text.encode() if isinstance(text, str) else text, digest_size=16
+        ).digest()
+        if (declaration := cache.get(key)) is None:
+            tokens = TokenStream(lexer.tokenize_stream(buffer, start, end))
+            declaration = parse_declaration(tokens)
+            if not tokens.at_end():
+                token = tokens.peek()
+                raise SyntaxError(
+                    f"Unexpected token after declaration: {token}"
+                    f" at offset {token.start}"
+                )
+            cache.put(key, declaration)
+        declarations.append(declaration)
+    return asdl.ProgramAST(declarations)
+
+
 def parse_param_list(tokens):
     params = []
-    if tokens[0] == "void":
-        take_token(tokens)
+    if tokens.peek().kind == Token.VOID_KEYWORD:
+        tokens.advance()
         return params
     while True:
-        expect("int", tokens)
-        key, next_token = lexer.Token.IDENTIFIER, take_token(tokens)
-        if not lexer.TOKEN_PATTERNS[key].match(next_token):
-            raise SyntaxError(f"'{next_token}' is not a valid {key}")
-        params.append(next_token)
-        if tokens[0] == ",":
-            take_token(tokens)
+        tokens.expect(Token.INT_KEYWORD)
+        params.append(tokens.expect(Token.IDENTIFIER).value)
+        if tokens.peek().kind == Token.COMMA:
+            tokens.advance()
         else:
             break
     return params
@@ -85,7 +269,7 @@ def parse_param_list(tokens):
 def parse_type_and_storage_class(specifiers):
     types, storage_classes = [], []
     for specifier in specifiers:
-        if specifier == "int":
+        if specifier == Token.INT_KEYWORD:
             types.append(specifier)
         else:
             storage_classes.append(specifier)
@@ -106,31 +290,31 @@ def parse_type_and_storage_class(specifiers):
 
 def parse_storage_class(storage_class):
     match storage_class:
-        case "static":
+        case Token.STATIC_KEYWORD:
             return asdl.StorageClassAST.STATIC
-        case "extern":
+        case Token.EXTERN_KEYWORD:
             return asdl.StorageClassAST.EXTERN
         case _:
             raise SyntaxError(f"Unknown storage class: {storage_class}")
 
 
 def parse_block(tokens):
-    expect("{", tokens)
+    tokens.expect(Token.OPEN_BRACE)
     items = []
-    while tokens[0] != "}":
+    while tokens.peek().kind != Token.CLOSE_BRACE:
         items.append(parse_block_item(tokens))
-    take_token(tokens)
+    tokens.advance()
     return asdl.BlockAST(items)
 
 
 def parse_block_item(tokens):
-    if tokens[0] in SPECIFIER:
+    if tokens.peek().kind in SPECIFIER:
         return asdl.DAST(parse_declaration(tokens))
     return asdl.SAST(parse_statement(tokens))
 
 
 def parse_for_init(tokens):
-    if tokens[0] in SPECIFIER:
+    if tokens.peek().kind in SPECIFIER:
         decl = parse_declaration(tokens)
         if isinstance(decl, asdl.VariableDeclaration):
             if decl.storage_class:
@@ -140,228 +324,234 @@ def parse_for_init(tokens):
         else:
             raise SyntaxError(f"Unexpected declaration: {decl}")
         return asdl.InitDeclAST(decl)
-    exp, token = None, ";"
-    if tokens[0] != token:
+    exp, token = None, Token.SEMICOLON
+    if tokens.peek().kind != token:
         exp = parse_exp(tokens)
-    expect(token, tokens)
+    tokens.expect(token)
     return asdl.InitExpAST(exp)
 
 
 def parse_declaration(tokens):
     specifiers = []
-    while tokens[0] in SPECIFIER:
-        specifiers.append(take_token(tokens))
+    while tokens.peek().kind in SPECIFIER:
+        specifiers.append(tokens.advance().kind)
     type_storage_class = parse_type_and_storage_class(specifiers)
-    name = take_token(tokens)
-    if not lexer.TOKEN_PATTERNS[lexer.Token.IDENTIFIER].match(name):
-        raise SyntaxError(f"Not an identifier: {name}")
+    name = tokens.expect(Token.IDENTIFIER).value
     exp = None
-    match tokens[0]:
-        case "(":
-            take_token(tokens)
+    match tokens.peek().kind:
+        case Token.OPEN_PARENTHESIS:
+            tokens.advance()
             params = parse_param_list(tokens)
-            expect(")", tokens)
+            tokens.expect(Token.CLOSE_PARENTHESIS)
             body = None
-            if tokens[0] == ";":
-                take_token(tokens)
+            if tokens.peek().kind == Token.SEMICOLON:
+                tokens.advance()
             else:
                 body = parse_block(tokens)
             return asdl.FuncDeclAST(name, params, body, type_storage_class[1])
-        case "=":
-            take_token(tokens)
+        case Token.ASSIGNMENT_OPERATOR:
+            tokens.advance()
             exp = parse_exp(tokens)
-    expect(";", tokens)
+    tokens.expect(Token.SEMICOLON)
     return asdl.VarDeclAST(name, exp, type_storage_class[1])
 
 
 def parse_statement(tokens):
-    match tokens[0]:
-        case "return":
-            take_token(tokens)
-            exp = parse_exp(tokens)
-            expect(";", tokens)
-            return asdl.ReturnAST(exp)
-        case "if":
-            take_token(tokens)
-            expect("(", tokens)
-            condition = parse_exp(tokens)
-            expect(")", tokens)
-            then = parse_statement(tokens)
-            else_ = None
-            if tokens[0] == "else":
-                take_token(tokens)
-                else_ = parse_statement(tokens)
-            return asdl.IfAST(condition, then, else_)
-        case "{":
-            return asdl.CompoundAST(parse_block(tokens))
-        case "break":
-            take_token(tokens)
-            expect(";", tokens)
-            return asdl.BreakAST("")
-        case "continue":
-            take_token(tokens)
-            expect(";", tokens)
-            return asdl.ContinueAST("")
-        case "while":
-            take_token(tokens)
-            expect("(", tokens)
-            condition = parse_exp(tokens)
-            expect(")", tokens)
-            body = parse_statement(tokens)
-            return asdl.WhileAST(condition, body, "")
-        case "do":
-            take_token(tokens)
-            body = parse_statement(tokens)
-            for token in ["while", "("]:
-                expect(token, tokens)
-            condition = parse_exp(tokens)
-            for token in [")", ";"]:
-                expect(token, tokens)
-            return asdl.DoWhileAST(body, condition, "")
-        case "for":
-            take_token(tokens)
-            expect("(", tokens)
-            init = parse_for_init(tokens)
-            condition, token = None, ";"
-            if tokens[0] != token:
-                condition = parse_exp(tokens)
-            expect(token, tokens)
-            post, token = None, ")"
-            if tokens[0] != token:
-                post = parse_exp(tokens)
-            expect(token, tokens)
-            body = parse_statement(tokens)
-            return asdl.ForAST(init, condition, post, body, "")
-        case ";":
-            take_token(tokens)
-            return asdl.NullAST()
-        case _:
-            exp = parse_exp(tokens)
-            expect(";", tokens)
-            return asdl.ExpressionAST(exp)
+    if parse := STATEMENT_PARSERS[tokens.peek().kind]:
+        return parse(tokens)
+    exp = parse_exp(tokens)
+    tokens.expect(Token.SEMICOLON)
+    return asdl.ExpressionAST(exp)
 
 
-def parse_exp(tokens, min_prec=0):
-    left = parse_factor(tokens)
-    next_token = tokens[0]
-    while next_token in PRECEDENCE and PRECEDENCE[next_token] >= min_prec:
-        match next_token:
-            case "=":
-                take_token(tokens)
-                right = parse_exp(tokens, PRECEDENCE[next_token])
-                left = asdl.AssignmentAST(left, right)
-            case "?":
-                middle = parse_conditional_middle(tokens)
-                right = parse_exp(tokens, PRECEDENCE[next_token])
-                left = asdl.ConditionalAST(left, middle, right)
-            case _:
-                operator = parse_binop(tokens)
-                right = parse_exp(tokens, PRECEDENCE[next_token] + 1)
-                left = asdl.BinaryAST(operator, left, right)
-        next_token = tokens[0]
-    return left
-
-
-def parse_conditional_middle(tokens):
-    expect("?", tokens)
+def parse_return_statement(tokens):
+    tokens.advance()
+    exp = parse_exp(tokens)
+    tokens.expect(Token.SEMICOLON)
+    return asdl.ReturnAST(exp)
+
+
+def parse_if_statement(tokens):
+    tokens.advance()
+    tokens.expect(Token.OPEN_PARENTHESIS)
     condition = parse_exp(tokens)
-    expect(":", tokens)
-    return condition
-
-
-def parse_factor(tokens):
-    next_token = tokens[0]
-    if lexer.TOKEN_PATTERNS[lexer.Token.CONSTANT].match(next_token):
-        take_token(tokens)
-        return asdl.ConstantAST(int(next_token))
-    if lexer.TOKEN_PATTERNS[lexer.Token.IDENTIFIER].match(next_token):
-        for keyword in (
-            lexer.Token.INT_KEYWORD,
-            lexer.Token.VOID_KEYWORD,
-            lexer.Token.RETURN_KEYWORD,
-            lexer.Token.IF_KEYWORD,
-            lexer.Token.ELSE_KEYWORD,
-            lexer.Token.DO_KEYWORD,
-            lexer.Token.WHILE_KEYWORD,
-            lexer.Token.FOR_KEYWORD,
-            lexer.Token.BREAK_KEYWORD,
-            lexer.Token.CONTINUE_KEYWORD,
-            lexer.Token.STATIC_KEYWORD,
-            lexer.Token.EXTERN_KEYWORD,
-        ):
-            if lexer.TOKEN_PATTERNS[keyword].match(next_token):
-                raise SyntaxError(f"{next_token} is a keyword and not an identifier")
-        take_token(tokens)
-        if tokens[0] == "(":
-            take_token(tokens)
-            args, token = [], ")"
-            if tokens[0] != token:
-                args.extend(parse_argument_list(tokens))
-            expect(token, tokens)
-            return asdl.FunctionCallAST(next_token, args)
-        return asdl.VarAST(next_token)
-    if next_token in ("~", "-", "!"):
-        return asdl.UnaryAST(
-            parse_unop(tokens),
-            parse_factor(tokens),
-        )
-    if next_token == "(":
-        take_token(tokens)
-        inner_exp = parse_exp(tokens)
-        expect(")", tokens)
-        return inner_exp
-    raise SyntaxError(f"Malformed expression: {next_token}")
-
-
-def parse_argument_list(tokens):
-    r = [parse_exp(tokens)]
-    while tokens[0] == ",":
-        take_token(tokens)
-        r.append(parse_exp(tokens))
-    return r
-
-
-def parse_unop(tokens):
-    match token := take_token(tokens):
-        case "-":
-            return asdl.UnaryOperatorAST.NEGATE
-        case "~":
-            return asdl.UnaryOperatorAST.COMPLEMENT
-        case "!":
-            return asdl.UnaryOperatorAST.NOT
-        case _:
-            raise SyntaxError(f"Unknown unary operator: {token}")
-
-
-def parse_binop(tokens):
-    match token := take_token(tokens):
-        case "-":
-            return asdl.BinaryOperatorAST.SUBTRACT
-        case "+":
-            return asdl.BinaryOperatorAST.ADD
-        case "*":
-            return asdl.BinaryOperatorAST.MULTIPLY
-        case "/":
-            return asdl.BinaryOperatorAST.DIVIDE
-        case "%":
-            return asdl.BinaryOperatorAST.REMAINDER
-        case "<":
-            return asdl.BinaryOperatorAST.LESS_THAN
-        case "<=":
-            return asdl.BinaryOperatorAST.LESS_OR_EQUAL
-        case ">":
-            return asdl.BinaryOperatorAST.GREATER_THAN
-        case ">=":
-            return asdl.BinaryOperatorAST.GREATER_OR_EQUAL
-        case "==":
-            return asdl.BinaryOperatorAST.EQUAL
-        case "!=":
-            return asdl.BinaryOperatorAST.NOT_EQUAL
-        case "&&":
-            return asdl.BinaryOperatorAST.AND
-        case "||":
-            return asdl.BinaryOperatorAST.OR
-        case "=":
-            return asdl.BinaryOperatorAST.VAR_ASSIGN
-        case _:
-            raise SyntaxError(f"Unknown binary operator: {token}")
+    tokens.expect(Token.CLOSE_PARENTHESIS)
+    then = parse_statement(tokens)
+    else_ = None
+    if tokens.peek().kind == Token.ELSE_KEYWORD:
+        tokens.advance()
+        else_ = parse_statement(tokens)
+    return asdl.IfAST(condition, then, else_)
+
+
+def parse_compound_statement(tokens):
+    return asdl.CompoundAST(parse_block(tokens))
+
+
+def parse_break_statement(tokens):
+    tokens.advance()
+    tokens.expect(Token.SEMICOLON)
+    return asdl.BreakAST("")
+
+
+def parse_continue_statement(tokens):
+    tokens.advance()
+    tokens.expect(Token.SEMICOLON)
+    return asdl.ContinueAST("")
+
+
+def parse_while_statement(tokens):
+    tokens.advance()
+    tokens.expect(Token.OPEN_PARENTHESIS)
+    condition = parse_exp(tokens)
+    tokens.expect(Token.CLOSE_PARENTHESIS)
+    body = parse_statement(tokens)
+    return asdl.WhileAST(condition, body, "")
+
+
+def parse_do_while_statement(tokens):
+    tokens.advance()
+    body = parse_statement(tokens)
+    for token in [Token.WHILE_KEYWORD, Token.OPEN_PARENTHESIS]:
+        tokens.expect(token)
+    condition = parse_exp(tokens)
+    for token in [Token.CLOSE_PARENTHESIS, Token.SEMICOLON]:
+        tokens.expect(token)
+    return asdl.DoWhileAST(body, condition, "")
+
+
+def parse_for_statement(tokens):
+    tokens.advance()
+    tokens.expect(Token.OPEN_PARENTHESIS)
+    init = parse_for_init(tokens)
+    condition, token = None, Token.SEMICOLON
+    if tokens.peek().kind != token:
+        condition = parse_exp(tokens)
+    tokens.expect(token)
+    post, token = None, Token.CLOSE_PARENTHESIS
+    if tokens.peek().kind != token:
+        post = parse_exp(tokens)
+    tokens.expect(token)
+    body = parse_statement(tokens)
+    return asdl.ForAST(init, condition, post, body, "")
+
+
+def parse_null_statement(tokens):
+    tokens.advance()
+    return asdl.NullAST()
+
+
+STATEMENT_PARSERS = lexer.kind_table(
+    {
+        Token.RETURN_KEYWORD: parse_return_statement,
+        Token.IF_KEYWORD: parse_if_statement,
+        Token.OPEN_BRACE: parse_compound_statement,
+        Token.BREAK_KEYWORD: parse_break_statement,
+        Token.CONTINUE_KEYWORD: parse_continue_statement,
+        Token.WHILE_KEYWORD: parse_while_statement,
+        Token.DO_KEYWORD: parse_do_while_statement,
+        Token.FOR_KEYWORD: parse_for_statement,
+        Token.SEMICOLON: parse_null_statement,
+    }
+)
+
+
+# Pending constructs on the explicit stack of parse_exp().
+_EXP, _UNARY, _BINARY, _ASSIGNMENT = range(4)
+_MIDDLE, _CONDITIONAL, _PARENTHESIS, _CALL = range(4, 8)
+
+
+def parse_exp(tokens, min_prec=0):
+    # Precedence climbing, with the recursion of the textbook formulation
+    # replaced by a stack of pending constructs, so that neither nesting depth
+    # nor operator chain length is bounded by the Python recursion limit.
+    # (_EXP, min_prec) marks an expression whose left operand is being parsed.
+    stack = [(_EXP, min_prec)]
+    while True:
+        value = None
+        while value is None:
+            token = tokens.peek()
+            match kind := token.kind:
+                case Token.CONSTANT:
+                    tokens.advance()
+                    value = asdl.ConstantAST(token.value)
+                case Token.IDENTIFIER:
+                    tokens.advance()
+                    if tokens.peek().kind != Token.OPEN_PARENTHESIS:
+                        value = asdl.VarAST(token.value)
+                        continue
+                    tokens.advance()
+                    if tokens.peek().kind == Token.CLOSE_PARENTHESIS:
+                        tokens.advance()
+                        value = asdl.FunctionCallAST(token.value, [])
+                        continue
+                    stack += (_CALL, token.value, []), (_EXP, 0)
+                case Token.OPEN_PARENTHESIS:
+                    tokens.advance()
+                    stack += (_PARENTHESIS,), (_EXP, 0)
+                case _:
+                    if not (operator := UNARY_OPERATORS[kind]):
+                        raise SyntaxError(
+                            f"Malformed expression: {token} at offset {token.start}"
+                        )
+                    tokens.advance()
+                    stack.append((_UNARY, operator))
+
+        while True:
+            frame = stack[-1]
+            tag = frame[0]
+            if tag == _UNARY:
+                stack.pop()
+                value = asdl.UnaryAST(frame[1], value)
+            elif tag == _EXP:
+                min_prec = frame[1]
+                kind = tokens.peek().kind
+                if (precedence := PRECEDENCE[kind]) < min_prec:
+                    stack.pop()
+                    if not stack:
+                        return value
+                    continue
+                tokens.advance()
+                match kind:
+                    case Token.ASSIGNMENT_OPERATOR:
+                        stack[-1] = (_ASSIGNMENT, value, min_prec)
+                        stack.append((_EXP, precedence))
+                    case Token.QUESTION_MARK_DELIMITER:
+                        stack[-1] = (_MIDDLE, value, min_prec)
+                        stack.append((_EXP, 0))
+                    case _:
+                        operator = BINARY_OPERATORS[kind]
+                        stack[-1] = (_BINARY, operator, value, min_prec)
+                        stack.append((_EXP, precedence + 1))
+                break
+            elif tag == _BINARY:
+                _, operator, left, min_prec = frame
+                value = asdl.BinaryAST(operator, left, value)
+                stack[-1] = (_EXP, min_prec)
+            elif tag == _ASSIGNMENT:
+                _, left, min_prec = frame
+                value = asdl.AssignmentAST(left, value)
+                stack[-1] = (_EXP, min_prec)
+            elif tag == _MIDDLE:
+                _, condition, min_prec = frame
+                tokens.expect(Token.COLON_DELIMITER)
+                stack[-1] = (_CONDITIONAL, condition, value, min_prec)
+                stack.append((_EXP, PRECEDENCE[Token.QUESTION_MARK_DELIMITER]))
+                break
+            elif tag == _CONDITIONAL:
+                _, condition, middle, min_prec = frame
+                value = asdl.ConditionalAST(condition, middle, value)
+                stack[-1] = (_EXP, min_prec)
+            elif tag == _PARENTHESIS:
+                tokens.expect(Token.CLOSE_PARENTHESIS)
+                stack.pop()
+            else:
+                args = frame[2]
+                args.append(value)
+                if tokens.peek().kind == Token.COMMA:
+                    tokens.advance()
+                    stack.append((_EXP, 0))
+                    break
+                tokens.expect(Token.CLOSE_PARENTHESIS)
+                stack.pop()
+                value = asdl.FunctionCallAST(frame[1], args)
@@ -16,6 +16,7 @@
 from dataclasses import dataclass
 
 import asdl
+import visitor
 
 
 def _mk_tmp(prefix):
@@ -38,38 +39,52 @@ class LoopLabellingError(Exception): ...
 class TypeCheckError(Exception): ...
 
 
-def analyze(tree, symbols):
+def analyze(tree, symbols, fused=False):
     declarations = tree.declarations
+    if fused:
+        fused_analysis(declarations, symbols)
+        return
     identifier_resolution(declarations)
     type_check(declarations, symbols)
     loop_label(declarations)
 
 
 def identifier_resolution(declarations):
-    identifier_map, g = {}, {}
+    identifier_map, g = IdentifierMap(), {}
     for declaration in declarations:
-        resolve_declaration(declaration, identifier_map, g)
+        match declaration:
+            case asdl.FuncDeclAST():
+                RESOLVE.walk(declaration, identifier_map, g)
+            case asdl.VarDeclAST():
+                resolve_file_scope_variable_declaration(declaration, identifier_map)
 
 
 def resolve_block(block, identifier_map, g):
-    for block_item in block.items:
-        resolve_block_item(block_item, identifier_map, g)
+    yield from block.items
+
+
+def resolve_s(block_item, identifier_map, g):
+    yield block_item.statement
+
+
+def resolve_d(block_item, identifier_map, g):
+    check_local_function_body(declaration := block_item.declaration)
+    yield declaration
+
+
+def check_local_function_body(declaration):
+    match declaration:
+        case asdl.FuncDeclAST(name, _, body):
+            if body:
+                raise ResolutionError(f"Local '{name}' function declaration with body")
 
 
-def resolve_block_item(block_item, identifier_map, g):
-    match block_item:
-        case asdl.SAST(statement):
-            resolve_statement(statement, identifier_map, g)
-        case asdl.DAST(declaration):
-            resolve_declaration(declaration, identifier_map, g, True)
+def resolve_init_decl(init, identifier_map, g):
+    yield init.variable_declaration
 
 
-def resolve_for_init(init, identifier_map, g):
-    match init:
-        case asdl.InitDeclAST(d):
-            resolve_declaration(d, identifier_map, g, True)
-        case asdl.InitExpAST(e):
-            resolve_exp(e, identifier_map)
+def resolve_init_exp(init, identifier_map, g):
+    yield init.exp
 
 
 @dataclass
@@ -79,17 +94,38 @@ class MapEntry:
     has_linkage: bool
 
 
-def resolve_declaration(declaration, identifier_map, g, is_block_scope=False):
-    match declaration:
-        case asdl.FuncDeclAST(name, _, body):
-            if body and is_block_scope:
-                raise ResolutionError(f"Local '{name}' function declaration with body")
-            resolve_function_declaration(declaration, identifier_map, g)
-        case asdl.VarDeclAST():
-            if is_block_scope:
-                resolve_local_variable_declaration(declaration, identifier_map, g)
-            else:
-                resolve_file_scope_variable_declaration(declaration, identifier_map)
+class IdentifierMap:
+    # One scope of a chain.  Entering a scope is O(1); names from enclosing
+    # scopes are looked up through the parents and cached, as seen from this
+    # scope, on first use.  An enclosing scope cannot declare anything while
+    # an inner one is open, so the cache never goes stale.
+    __slots__ = ("_outer", "entries", "parent")
+
+    def __init__(self, parent=None):
+        self.entries = {}
+        self.parent = parent
+        self._outer = {}
+
+    def get(self, name):
+        if (entry := self.entries.get(name)) is not None:
+            return entry
+        if (entry := self._outer.get(name)) is not None:
+            return entry
+        scope = self.parent
+        while scope is not None:
+            if (entry := scope.entries.get(name)) is not None:
+                entry = MapEntry(entry.new_name, False, entry.has_linkage)
+                break
+            if (entry := scope._outer.get(name)) is not None:
+                break
+            scope = scope.parent
+        else:
+            return None
+        self._outer[name] = entry
+        return entry
+
+    def __setitem__(self, name, entry):
+        self.entries[name] = entry
 
 
 def resolve_file_scope_variable_declaration(declaration, identifier_map):
@@ -98,15 +134,22 @@ def resolve_file_scope_variable_declaration(declaration, identifier_map):
 
 
 def resolve_local_variable_declaration(declaration, identifier_map, g):
+    declare_local_variable(declaration, identifier_map, g)
+    if declaration.storage_class != asdl.StorageClassAST.EXTERN:
+        yield declaration.init
+
+
+def declare_local_variable(declaration, identifier_map, g):
     name = declaration.name
-    if name in identifier_map:
-        prev_entry = identifier_map[name]
-        if prev_entry.from_current_scope:
-            if not (
-                prev_entry.has_linkage
-                and declaration.storage_class == asdl.StorageClassAST.EXTERN
-            ):
-                raise ResolutionError(f"Conflicting local declarations for {name}")
+    if (
+        (prev_entry := identifier_map.get(name))
+        and prev_entry.from_current_scope
+        and not (
+            prev_entry.has_linkage
+            and declaration.storage_class == asdl.StorageClassAST.EXTERN
+        )
+    ):
+        raise ResolutionError(f"Conflicting local declarations for {name}")
     if declaration.storage_class == asdl.StorageClassAST.EXTERN:
         identifier_map[name] = MapEntry(name, True, True)
     else:
@@ -114,29 +157,33 @@ def resolve_local_variable_declaration(declaration, identifier_map, g):
             g[name] = _mk_tmp(name + ".")
         declaration.name = make_temporary(g[name])
         identifier_map[name] = MapEntry(declaration.name, True, False)
-        resolve_exp(declaration.init, identifier_map)
 
 
 def resolve_function_declaration(decl, identifier_map, g):
+    inner_map = declare_function(decl, identifier_map, g)
+    if body := decl.body:
+        yield body, inner_map, g
+
+
+def declare_function(decl, identifier_map, g):
     name = decl.name
-    if name in identifier_map:
-        prev_entry = identifier_map[name]
-        if prev_entry.from_current_scope and not prev_entry.has_linkage:
-            raise ResolutionError(f"Duplicate declaration: {name}")
+    if (
+        (prev_entry := identifier_map.get(name))
+        and prev_entry.from_current_scope
+        and not prev_entry.has_linkage
+    ):
+        raise ResolutionError(f"Duplicate declaration: {name}")
 
     identifier_map[name] = MapEntry(name, True, True)
-    inner_map = copy_identifier_map(identifier_map)
+    inner_map = IdentifierMap(identifier_map)
     for index, param in enumerate(decl.params[:]):
         decl.params[index] = resolve_param(param, inner_map, g)
-
-    if body := decl.body:
-        resolve_block(body, inner_map, g)
+    return inner_map
 
 
 def resolve_param(name, identifier_map, g):
-    if name in identifier_map:
-        if identifier_map[name].from_current_scope:
-            raise ResolutionError(f"Duplicate identifier declaration for {name}!")
+    if name in identifier_map.entries:
+        raise ResolutionError(f"Duplicate identifier declaration for {name}!")
     if name not in g:
         g[name] = _mk_tmp(name + ".")
     new_name = make_temporary(g[name])
@@ -144,72 +191,114 @@ def resolve_param(name, identifier_map, g):
     return new_name
 
 
-def resolve_statement(statement, identifier_map, g):
-    match statement:
-        case asdl.ReturnAST(e) | asdl.ExpressionAST(e):
-            resolve_exp(e, identifier_map)
-        case asdl.IfAST(condition, then, else_):
-            resolve_exp(condition, identifier_map)
-            resolve_statement(then, identifier_map, g)
-            resolve_statement(else_, identifier_map, g)
-        case asdl.WhileAST(condition, body, _):
-            resolve_exp(condition, identifier_map)
-            resolve_statement(body, identifier_map, g)
-        case asdl.DoWhileAST(body, condition, _):
-            resolve_statement(body, identifier_map, g)
-            resolve_exp(condition, identifier_map)
-        case asdl.ForAST(init, condition, post, body, _):
-            new_identifier_map = copy_identifier_map(identifier_map)
-            resolve_for_init(init, new_identifier_map, g)
-            resolve_exp(condition, new_identifier_map)
-            resolve_exp(post, new_identifier_map)
-            resolve_statement(body, new_identifier_map, g)
-        case asdl.CompoundAST(block):
-            resolve_block(block, copy_identifier_map(identifier_map), g)
-
-
-def resolve_exp(e, identifier_map):
-    match e:
-        case asdl.VarAST(identifier):
-            if identifier not in identifier_map:
-                raise ResolutionError(f"Undeclared variable: {identifier}!")
-            e.identifier = identifier_map[identifier].new_name
-        case asdl.UnaryAST(_, exp):
-            resolve_exp(exp, identifier_map)
-        case asdl.BinaryAST(_, e1, e2):
-            resolve_exp(e1, identifier_map)
-            resolve_exp(e2, identifier_map)
-        case asdl.AssignmentAST(left, right):
-            if not isinstance(left, asdl.VarAST):
-                raise ResolutionError(f"Invalid lvalue: {left}!")
-            resolve_exp(left, identifier_map)
-            resolve_exp(right, identifier_map)
-        case asdl.ConditionalAST(condition, e1, e2):
-            resolve_exp(condition, identifier_map)
-            resolve_exp(e1, identifier_map)
-            resolve_exp(e2, identifier_map)
-        case asdl.FunctionCallAST(name, args):
-            if name not in identifier_map:
-                raise ResolutionError(f"Undeclared function: {name}")
-            e.name = identifier_map[name].new_name
-            for arg in args:
-                resolve_exp(arg, identifier_map)
-
-
-def copy_identifier_map(identifier_map):
-    new_identifier_map = {}
-    for name, map_entry in identifier_map.items():
-        new_identifier_map[name] = MapEntry(
-            map_entry.new_name, False, map_entry.has_linkage
-        )
-    return new_identifier_map
+def resolve_exp_statement(statement, identifier_map, g):
+    yield statement.exp
+
+
+def resolve_if(statement, identifier_map, g):
+    yield statement.condition
+    yield statement.then
+    yield statement.else_
+
+
+def resolve_while(statement, identifier_map, g):
+    yield statement.condition
+    yield statement.body
+
+
+def resolve_do_while(statement, identifier_map, g):
+    yield statement.body
+    yield statement.condition
+
+
+def resolve_for(statement, identifier_map, g):
+    new_identifier_map = IdentifierMap(identifier_map)
+    yield statement.init, new_identifier_map, g
+    yield statement.condition, new_identifier_map, g
+    yield statement.post, new_identifier_map, g
+    yield statement.body, new_identifier_map, g
+
+
+def resolve_compound(statement, identifier_map, g):
+    yield statement.block, IdentifierMap(identifier_map), g
+
+
+def resolve_var(e, identifier_map, g):
+    identifier = e.identifier
+    if not (entry := identifier_map.get(identifier)):
+        raise ResolutionError(f"Undeclared variable: {identifier}!")
+    e.identifier = entry.new_name
+
+
+def resolve_unary(e, identifier_map, g):
+    yield e.exp
+
+
+def resolve_binary(e, identifier_map, g):
+    yield e.lhs
+    yield e.rhs
+
+
+def resolve_assignment(e, identifier_map, g):
+    check_lvalue(e)
+    yield e.lhs
+    yield e.rhs
+
+
+def check_lvalue(e):
+    if not isinstance(left := e.lhs, asdl.VarAST):
+        raise ResolutionError(f"Invalid lvalue: {left}!")
+
+
+def resolve_conditional(e, identifier_map, g):
+    yield e.condition
+    yield e.e1
+    yield e.e2
+
+
+def resolve_function_call(e, identifier_map, g):
+    resolve_function_name(e, identifier_map)
+    yield from e.args
+
+
+def resolve_function_name(e, identifier_map):
+    name = e.name
+    if not (entry := identifier_map.get(name)):
+        raise ResolutionError(f"Undeclared function: {name}")
+    e.name = entry.new_name
+
+
+RESOLVE = visitor.Visitor(
+    {
+        asdl.BlockAST: resolve_block,
+        asdl.SAST: resolve_s,
+        asdl.DAST: resolve_d,
+        asdl.InitDeclAST: resolve_init_decl,
+        asdl.InitExpAST: resolve_init_exp,
+        asdl.FuncDeclAST: resolve_function_declaration,
+        asdl.VarDeclAST: resolve_local_variable_declaration,
+        asdl.ReturnAST: resolve_exp_statement,
+        asdl.ExpressionAST: resolve_exp_statement,
+        asdl.IfAST: resolve_if,
+        asdl.WhileAST: resolve_while,
+        asdl.DoWhileAST: resolve_do_while,
+        asdl.ForAST: resolve_for,
+        asdl.CompoundAST: resolve_compound,
+        asdl.VarAST: resolve_var,
+        asdl.UnaryAST: resolve_unary,
+        asdl.BinaryAST: resolve_binary,
+        asdl.AssignmentAST: resolve_assignment,
+        asdl.ConditionalAST: resolve_conditional,
+        asdl.FunctionCallAST: resolve_function_call,
+    }
+)
 
 
 def type_check(declarations, symbols):
     for declaration in declarations:
         match declaration:
             case asdl.FuncDeclAST():
-                type_check_function_declaration(declaration, symbols)
+                TYPE_CHECK.walk(declaration, symbols)
             case asdl.VarDeclAST():
                 type_check_file_scope_variable_declaration(declaration, symbols)
 
@@ -258,6 +347,12 @@ def type_check_file_scope_variable_declaration(decl, symbols):
 
 
 def type_check_local_variable_declaration(decl, symbols):
+    declare_local_variable_type(decl, symbols)
+    if decl.storage_class is None:
+        yield decl.init
+
+
+def declare_local_variable_type(decl, symbols):
     name = decl.name
     match decl.storage_class:
         case asdl.StorageClassAST.EXTERN:
@@ -290,11 +385,15 @@ def type_check_local_variable_declaration(decl, symbols):
             )
         case _:
             symbols[name] = SymbolEntry(asdl.IntType, asdl.LocalAttrTC())
-            if init := decl.init:
-                type_check_exp(init, symbols)
 
 
 def type_check_function_declaration(decl, symbols):
+    declare_function_type(decl, symbols)
+    if (body := decl.body) is not None:
+        yield body
+
+
+def declare_function_type(decl, symbols):
     params = decl.params
     fun_type = asdl.FunType(len(params))
     body = decl.body
@@ -327,135 +426,350 @@ def type_check_function_declaration(decl, symbols):
     if has_body:
         for param in params:
             symbols[param] = SymbolEntry(asdl.IntType, None)
-        type_check_block(body, symbols)
 
 
-def type_check_block_item(block_item, symbols):
-    match block_item:
-        case asdl.SAST(statement):
-            type_check_statement(statement, symbols)
-        case asdl.DAST(declaration):
-            match declaration:
-                case asdl.FuncDeclAST(name, _, _, storage_class):
-                    if storage_class and storage_class == asdl.StorageClassAST.STATIC:
-                        raise TypeCheckError(
-                            f"Cannot declare '{name}' block-scope function declaration with `static`"
-                        )
-                    type_check_function_declaration(declaration, symbols)
-                case asdl.VarDeclAST():
-                    type_check_local_variable_declaration(declaration, symbols)
+def type_check_s(block_item, symbols):
+    yield block_item.statement
 
 
-def type_check_block(block, symbols):
-    for block_item in block.items:
-        type_check_block_item(block_item, symbols)
+def type_check_d(block_item, symbols):
+    check_local_function_storage(declaration := block_item.declaration)
+    yield declaration
 
 
-def type_check_for_init(i, symbols):
-    match i:
-        case asdl.InitDeclAST(var_decl):
-            if var_decl.storage_class:
-                raise TypeCheckError(
-                    "Forbidden storage-class specifier for '{var_decl.name}'"
-                )
-            type_check_local_variable_declaration(var_decl, symbols)
-        case asdl.InitExpAST(e):
-            type_check_exp(e, symbols)
-
-
-def type_check_statement(s, symbols):
-    match s:
-        case asdl.ReturnAST(e) | asdl.ExpressionAST(e):
-            type_check_exp(e, symbols)
-        case asdl.IfAST(condition, then, else_):
-            type_check_exp(condition, symbols)
-            type_check_statement(then, symbols)
-            type_check_statement(else_, symbols)
-        case asdl.WhileAST(cond, body, _) | asdl.DoWhileAST(body, cond, _):
-            type_check_exp(cond, symbols)
-            type_check_statement(body, symbols)
-        case asdl.ForAST(init, cond, post, body, _):
-            type_check_for_init(init, symbols)
-            type_check_exp(cond, symbols)
-            type_check_exp(post, symbols)
-            type_check_statement(body, symbols)
-        case asdl.CompoundAST(block):
-            type_check_block(block, symbols)
-
-
-def type_check_exp(e, symbols):
-    match e:
-        case asdl.UnaryAST(_, e):
-            type_check_exp(e, symbols)
-        case asdl.BinaryAST(_, lhs, rhs) | asdl.AssignmentAST(lhs, rhs):
-            type_check_exp(lhs, symbols)
-            type_check_exp(rhs, symbols)
-        case asdl.ConditionalAST(cond, e1, e2):
-            type_check_exp(cond, symbols)
-            type_check_exp(e1, symbols)
-            type_check_exp(e2, symbols)
-        case asdl.FunctionCallAST(f, args):
-            f_type = symbols[f].type
-            if f_type == asdl.IntType:
-                raise TypeCheckError(f"Variable {f} used as function name")
-            if f_type.param_count != len(args):
+def check_local_function_storage(declaration):
+    match declaration:
+        case asdl.FuncDeclAST(name, _, _, storage_class):
+            if storage_class and storage_class == asdl.StorageClassAST.STATIC:
                 raise TypeCheckError(
-                    f"Function {f} called with the wrong number of arguments"
+                    f"Cannot declare '{name}' block-scope function declaration with `static`"
                 )
-            for arg in args:
-                type_check_exp(arg, symbols)
-        case asdl.VarAST(v):
-            if symbols[v].type != asdl.IntType:
-                raise TypeCheckError(f"Function name {v} used a variable")
+
+
+def type_check_block(block, symbols):
+    yield from block.items
+
+
+def type_check_init_decl(i, symbols):
+    check_for_init_declaration(var_decl := i.variable_declaration)
+    yield var_decl
+
+
+def check_for_init_declaration(var_decl):
+    if var_decl.storage_class:
+        raise TypeCheckError("Forbidden storage-class specifier for '{var_decl.name}'")
+
+
+def type_check_init_exp(i, symbols):
+    yield i.exp
+
+
+def type_check_exp_statement(s, symbols):
+    yield s.exp
+
+
+def type_check_if(s, symbols):
+    yield s.condition
+    yield s.then
+    yield s.else_
+
+
+def type_check_loop(s, symbols):
+    yield s.condition
+    yield s.body
+
+
+def type_check_for(s, symbols):
+    yield s.init
+    yield s.condition
+    yield s.post
+    yield s.body
+
+
+def type_check_compound(s, symbols):
+    yield s.block
+
+
+def type_check_unary(e, symbols):
+    yield e.exp
+
+
+def type_check_binary(e, symbols):
+    yield e.lhs
+    yield e.rhs
+
+
+def type_check_conditional(e, symbols):
+    yield e.condition
+    yield e.e1
+    yield e.e2
+
+
+def type_check_function_call(e, symbols):
+    check_function_call(e, symbols)
+    yield from e.args
+
+
+def check_function_call(e, symbols):
+    f, args = e.name, e.args
+    f_type = symbols[f].type
+    if f_type == asdl.IntType:
+        raise TypeCheckError(f"Variable {f} used as function name")
+    if f_type.param_count != len(args):
+        raise TypeCheckError(f"Function {f} called with the wrong number of arguments")
+
+
+def type_check_var(e, symbols):
+    if symbols[v := e.identifier].type != asdl.IntType:
+        raise TypeCheckError(f"Function name {v} used a variable")
+
+
+TYPE_CHECK = visitor.Visitor(
+    {
+        asdl.BlockAST: type_check_block,
+        asdl.SAST: type_check_s,
+        asdl.DAST: type_check_d,
+        asdl.InitDeclAST: type_check_init_decl,
+        asdl.InitExpAST: type_check_init_exp,
+        asdl.FuncDeclAST: type_check_function_declaration,
+        asdl.VarDeclAST: type_check_local_variable_declaration,
+        asdl.ReturnAST: type_check_exp_statement,
+        asdl.ExpressionAST: type_check_exp_statement,
+        asdl.IfAST: type_check_if,
+        asdl.WhileAST: type_check_loop,
+        asdl.DoWhileAST: type_check_loop,
+        asdl.ForAST: type_check_for,
+        asdl.CompoundAST: type_check_compound,
+        asdl.UnaryAST: type_check_unary,
+        asdl.BinaryAST: type_check_binary,
+        asdl.AssignmentAST: type_check_binary,
+        asdl.ConditionalAST: type_check_conditional,
+        asdl.FunctionCallAST: type_check_function_call,
+        asdl.VarAST: type_check_var,
+    }
+)
 
 
 def loop_label(declarations):
-    g = {label: _mk_tmp(label) for label in ("w", "d", "f")}
+    g = make_loop_labels()
     for declaration in declarations:
         if isinstance(declaration, asdl.FuncDeclAST):
-            label_func_decl(g, declaration)
-
-
-def label_func_decl(g, function_declaration):
-    if block := function_declaration.body:
-        label_block(g, block)
-
-
-def label_block(g, block, current_label=None):
-    for block_item in block.items:
-        label_block_item(g, block_item, current_label)
-
-
-def label_block_item(g, block_item, current_label=None):
-    match block_item:
-        case asdl.SAST(statement):
-            label_statement(g, statement, current_label)
-
-
-def label_statement(g, statement, current_label=None):
-    match statement:
-        case asdl.IfAST(_, then, else_):
-            label_statement(g, then, current_label)
-            label_statement(g, else_, current_label)
-        case asdl.BreakAST(_):
-            if not current_label:
-                raise LoopLabellingError("break statement outside of loop")
-            statement.label = current_label
-        case asdl.ContinueAST(_):
-            if not current_label:
-                raise LoopLabellingError("continue statement outside of loop")
-            statement.label = current_label
-        case asdl.WhileAST(_, body, _):
-            new_label = make_label(g["w"])
-            label_statement(g, body, new_label)
-            statement.label = new_label
-        case asdl.DoWhileAST(body, _, _):
-            new_label = make_label(g["d"])
-            label_statement(g, body, new_label)
-            statement.label = new_label
-        case asdl.ForAST(_, _, _, body, _):
-            new_label = make_label(g["f"])
-            label_statement(g, body, new_label)
-            statement.label = new_label
-        case asdl.CompoundAST(block):
-            label_block(g, block, current_label)
+            LOOP_LABEL.walk(declaration, g, None)
+
+
+def make_loop_labels():
+    return {label: _mk_tmp(label) for label in ("w", "d", "f")}
+
+
+def label_func_decl(function_declaration, g, current_label):
+    yield function_declaration.body
+
+
+def label_block(block, g, current_label):
+    yield from block.items
+
+
+def label_s(block_item, g, current_label):
+    yield block_item.statement
+
+
+def label_if(statement, g, current_label):
+    yield statement.then
+    yield statement.else_
+
+
+def label_break(statement, g, current_label):
+    if not current_label:
+        raise LoopLabellingError("break statement outside of loop")
+    statement.label = current_label
+
+
+def label_continue(statement, g, current_label):
+    if not current_label:
+        raise LoopLabellingError("continue statement outside of loop")
+    statement.label = current_label
+
+
+def _label_loop(prefix):
+    def label_loop(statement, g, current_label):
+        statement.label = new_label = make_label(g[prefix])
+        yield statement.body, g, new_label
+
+    return label_loop
+
+
+def label_compound(statement, g, current_label):
+    yield statement.block
+
+
+LOOP_LABEL = visitor.Visitor(
+    {
+        asdl.FuncDeclAST: label_func_decl,
+        asdl.BlockAST: label_block,
+        asdl.SAST: label_s,
+        asdl.IfAST: label_if,
+        asdl.BreakAST: label_break,
+        asdl.ContinueAST: label_continue,
+        asdl.WhileAST: _label_loop("w"),
+        asdl.DoWhileAST: _label_loop("d"),
+        asdl.ForAST: _label_loop("f"),
+        asdl.CompoundAST: label_compound,
+    }
+)
+
+
+# Resolution, type checking and loop labelling in a single walk per function.
+# Each handler runs the three passes' actions on its node in pass order.
+
+
+def fused_analysis(declarations, symbols):
+    identifier_map, g, labels = IdentifierMap(), {}, make_loop_labels()
+    for declaration in declarations:
+        match declaration:
+            case asdl.FuncDeclAST():
+                ANALYZE.walk(declaration, identifier_map, g, symbols, labels, None)
+            case asdl.VarDeclAST():
+                resolve_file_scope_variable_declaration(declaration, identifier_map)
+                type_check_file_scope_variable_declaration(declaration, symbols)
+
+
+def analyze_function_declaration(
+    decl, identifier_map, g, symbols, labels, current_label
+):
+    inner_map = declare_function(decl, identifier_map, g)
+    declare_function_type(decl, symbols)
+    if body := decl.body:
+        yield body, inner_map, g, symbols, labels, current_label
+
+
+def analyze_local_variable_declaration(
+    decl, identifier_map, g, symbols, labels, current_label
+):
+    declare_local_variable(decl, identifier_map, g)
+    declare_local_variable_type(decl, symbols)
+    if decl.storage_class != asdl.StorageClassAST.EXTERN:
+        yield decl.init
+
+
+def analyze_block(block, identifier_map, g, symbols, labels, current_label):
+    yield from block.items
+
+
+def analyze_s(block_item, identifier_map, g, symbols, labels, current_label):
+    yield block_item.statement
+
+
+def analyze_d(block_item, identifier_map, g, symbols, labels, current_label):
+    declaration = block_item.declaration
+    check_local_function_body(declaration)
+    check_local_function_storage(declaration)
+    yield declaration
+
+
+def analyze_init_decl(init, identifier_map, g, symbols, labels, current_label):
+    check_for_init_declaration(var_decl := init.variable_declaration)
+    yield var_decl
+
+
+def analyze_exp_child(node, identifier_map, g, symbols, labels, current_label):
+    yield node.exp
+
+
+def analyze_if(statement, identifier_map, g, symbols, labels, current_label):
+    yield statement.condition
+    yield statement.then
+    yield statement.else_
+
+
+def analyze_break(statement, identifier_map, g, symbols, labels, current_label):
+    label_break(statement, labels, current_label)
+
+
+def analyze_continue(statement, identifier_map, g, symbols, labels, current_label):
+    label_continue(statement, labels, current_label)
+
+
+def analyze_while(statement, identifier_map, g, symbols, labels, current_label):
+    statement.label = new_label = make_label(labels["w"])
+    yield statement.condition
+    yield statement.body, identifier_map, g, symbols, labels, new_label
+
+
+def analyze_do_while(statement, identifier_map, g, symbols, labels, current_label):
+    statement.label = new_label = make_label(labels["d"])
+    yield statement.body, identifier_map, g, symbols, labels, new_label
+    yield statement.condition
+
+
+def analyze_for(statement, identifier_map, g, symbols, labels, current_label):
+    statement.label = new_label = make_label(labels["f"])
+    new_identifier_map = IdentifierMap(identifier_map)
+    yield statement.init, new_identifier_map, g, symbols, labels, current_label
+    yield statement.condition, new_identifier_map, g, symbols, labels, current_label
+    yield statement.post, new_identifier_map, g, symbols, labels, current_label
+    yield statement.body, new_identifier_map, g, symbols, labels, new_label
+
+
+def analyze_compound(statement, identifier_map, g, symbols, labels, current_label):
+    new_identifier_map = IdentifierMap(identifier_map)
+    yield statement.block, new_identifier_map, g, symbols, labels, current_label
+
+
+def analyze_var(e, identifier_map, g, symbols, labels, current_label):
+    resolve_var(e, identifier_map, g)
+    type_check_var(e, symbols)
+
+
+def analyze_unary(e, identifier_map, g, symbols, labels, current_label):
+    yield e.exp
+
+
+def analyze_binary(e, identifier_map, g, symbols, labels, current_label):
+    yield e.lhs
+    yield e.rhs
+
+
+def analyze_assignment(e, identifier_map, g, symbols, labels, current_label):
+    check_lvalue(e)
+    yield e.lhs
+    yield e.rhs
+
+
+def analyze_conditional(e, identifier_map, g, symbols, labels, current_label):
+    yield e.condition
+    yield e.e1
+    yield e.e2
+
+
+def analyze_function_call(e, identifier_map, g, symbols, labels, current_label):
+    resolve_function_name(e, identifier_map)
+    check_function_call(e, symbols)
+    yield from e.args
+
+
+ANALYZE = visitor.Visitor(
+    {
+        asdl.BlockAST: analyze_block,
+        asdl.SAST: analyze_s,
+        asdl.DAST: analyze_d,
+        asdl.InitDeclAST: analyze_init_decl,
+        asdl.InitExpAST: analyze_exp_child,
+        asdl.FuncDeclAST: analyze_function_declaration,
+        asdl.VarDeclAST: analyze_local_variable_declaration,
+        asdl.ReturnAST: analyze_exp_child,
+        asdl.ExpressionAST: analyze_exp_child,
+        asdl.IfAST: analyze_if,
+        asdl.BreakAST: analyze_break,
+        asdl.ContinueAST: analyze_continue,
+        asdl.WhileAST: analyze_while,
+        asdl.DoWhileAST: analyze_do_while,
+        asdl.ForAST: analyze_for,
+        asdl.CompoundAST: analyze_compound,
+        asdl.VarAST: analyze_var,
+        asdl.UnaryAST: analyze_unary,
+        asdl.BinaryAST: analyze_binary,
+        asdl.AssignmentAST: analyze_assignment,
+        asdl.ConditionalAST: analyze_conditional,
+        asdl.FunctionCallAST: analyze_function_call,
+    }
+)
@@ -0,0 +1,161 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from abc import ABC
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from operator import attrgetter
+from pathlib import Path
+
+import asdl
+import hashlib
+import marshal
+import semantic_analysis
+
+# A tree is written as a postorder program for a stack machine: PUSH takes the
+# next value (an int, string, bool or None), LIST collects the top n entries,
+# and the remaining opcodes either construct a node from the top entries or
+# push a constant such as an enum member.  The opcodes and the values are
+# kept in two streams, which marshal reads back at C speed.
+PUSH, LIST = 0, 1
+_PRIMITIVES = frozenset((int, str, bool, type(None)))
+
+
+class StageError(Exception): ...
+
+
+def _node_classes():
+    for value in vars(asdl).values():
+        if (
+            isinstance(value, type)
+            and value.__module__ == asdl.__name__
+            and not issubclass(value, Enum)
+            and ABC not in value.__bases__
+            and (is_dataclass(value) or vars(value).get("__slots__") == ())
+        ):
+            yield value
+    yield semantic_analysis.SymbolEntry
+
+
+def _field_getter(cls):
+    names = [f.name for f in fields(cls)] if is_dataclass(cls) else []
+    if len(names) == 1:
+        getter = attrgetter(names[0])
+        return len(names), lambda node: (getter(node),)
+    return len(names), attrgetter(*names) if names else lambda node: ()
+
+
+_DECODERS = [None, None]
+_CONSTRUCTORS = {}
+_CONSTANTS = {}
+for cls in _node_classes():
+    arity, getter = _field_getter(cls)
+    _CONSTRUCTORS[cls] = len(_DECODERS), getter
+    _DECODERS.append((cls, arity))
+    if not arity:
+        # Field-less classes double as values, as in SymbolEntry(asdl.IntType).
+        _CONSTANTS[cls] = len(_DECODERS)
+        _DECODERS.append((cls, -1))
+for enum in vars(asdl).values():
+    if isinstance(enum, type) and issubclass(enum, Enum) and enum is not Enum:
+        for member in enum:
+            _CONSTANTS[member] = len(_DECODERS)
+            _DECODERS.append((member, -1))
+_DECODERS = tuple(_DECODERS)
+
+
+def _tag():
+    # Stages written against other node classes cannot be read back.
+    h = hashlib.blake2b(digest_size=16)
+    for path in (asdl.__file__, semantic_analysis.__file__, __file__):
+        h.update(Path(path).read_bytes())
+    return h.digest()
+
+
+def encode(tree):
+    # Emit in preorder with the children reversed, then reverse everything to
+    # get a postorder with the children in order, without recursion.
+    ops, values, stack = bytearray(), [], [tree]
+    while stack:
+        node = stack.pop()
+        cls = node.__class__
+        if cls in _PRIMITIVES:
+            ops.append(PUSH)
+            values.append(node)
+        elif cls is list:
+            ops.append(LIST)
+            values.append(len(node))
+            stack.extend(node)
+        elif (constructor := _CONSTRUCTORS.get(cls)) is not None:
+            op, getter = constructor
+            ops.append(op)
+            stack.extend(getter(node))
+        elif (op := _CONSTANTS.get(node)) is not None:
+            ops.append(op)
+        else:
+            raise StageError(f"Cannot serialize {node!r}")
+    ops.reverse()
+    values.reverse()
+    return bytes(ops), values
+
+
+def decode(ops, values):
+    stack, decoders = [], _DECODERS
+    push, next_value = stack.append, iter(values).__next__
+    for op in ops:
+        if op == PUSH:
+            push(next_value())
+        elif op == LIST:
+            if n := next_value():
+                items = stack[-n:]
+                del stack[-n:]
+                push(items)
+            else:
+                push([])
+        else:
+            cls, arity = decoders[op]
+            if arity > 0:
+                args = stack[-arity:]
+                del stack[-arity:]
+                push(cls(*args))
+            elif arity:
+                push(cls)
+            else:
+                push(cls())
+    return stack.pop()
+
+
+def dumps(stage, tree, symbols):
+    ops, values = encode([tree, list(symbols.values())])
+    return marshal.dumps((_tag(), stage, list(symbols), ops, values))
+
+
+def loads(data):
+    try:
+        tag, stage, names, ops, values = marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+        raise StageError("Not a saved compilation stage")
+    if tag != _tag():
+        raise StageError("Stage was saved by a different version of the compiler")
+    tree, entries = decode(ops, values)
+    return stage, tree, dict(zip(names, entries))
+
+
+def save(path, stage, tree, symbols):
+    Path(path).write_bytes(dumps(stage, tree, symbols))
+
+
+def load(path):
+    return loads(Path(path).read_bytes())
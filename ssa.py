@@ -0,0 +1,225 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import asdl
+import cfg
+import names
+import tacky
+
+# SSA form gives every write of a local variable or temporary a variable of
+# its own, and merges the values that reach a join point with PhiTACKY
+# instructions placed after the block's label.  Reads that no write reaches,
+# such as those of parameters, keep the original variable.  Static
+# variables may change in calls, so they are left as they are.
+
+
+def construct(graph, context):
+    graph.remove_unreachable_blocks()
+    blocks, static = graph.blocks, context.static
+    # A conditional jump to the block that follows anyway would leave no
+    # edge to put that path's copies on when leaving SSA.
+    for index in graph.block_ids():
+        instructions = blocks[index].instructions
+        entry = graph.control[instructions[-1].__class__]
+        if (
+            entry is not None
+            and entry[0] == cfg.BRANCH
+            and len(blocks[index].successors) == 1
+        ):
+            instructions.pop()
+    idom = graph.dominators()
+    # Only variables read in some block before being written there can need
+    # a phi (semi-pruned SSA).
+    writes, read_first = {}, set()
+    for index in graph.block_ids():
+        written = set()
+        for instruction in blocks[index].instructions:
+            srcs, dst = tacky.operands(instruction)
+            for val in srcs:
+                if val.__class__ is asdl.VarTACKY and val not in written:
+                    read_first.add(val)
+            if dst is not None and not static[dst.identifier] and dst not in written:
+                written.add(dst)
+                writes.setdefault(dst, []).append(index)
+    phis = place_phis(graph, idom, writes, read_first)
+    rename(graph, idom, phis, context)
+
+
+def place_phis(graph, idom, writes, read_first):
+    frontiers = cfg.dominance_frontiers(graph, idom)
+    phis = {}
+    for var, indices in writes.items():
+        if var not in read_first:
+            continue
+        placed, queued = set(), set(indices)
+        while indices:
+            for index in frontiers[indices.pop()]:
+                if index not in placed and index != graph.exit:
+                    placed.add(index)
+                    phis.setdefault(index, []).append(var)
+                    if index not in queued:
+                        queued.add(index)
+                        indices.append(index)
+    for index, variables in phis.items():
+        block = graph.blocks[index]
+        predecessors = block.predecessors
+        nodes = [
+            asdl.PhiTACKY(var, [var] * len(predecessors), predecessors[:])
+            for var in variables
+        ]
+        start = 0 if graph.label(index) is None else 1
+        block.instructions[start:start] = nodes
+        phis[index] = list(zip(variables, nodes))
+    return phis
+
+
+def rename(graph, idom, phis, context):
+    blocks, static, table = graph.blocks, context.static, context.variables.table
+    children, versions = cfg.dominator_tree(idom), {}
+
+    def current(val):
+        if stack := versions.get(val):
+            return stack[-1]
+        return val
+
+    def new_version(var):
+        version = context.new_variable(names.name(table, var.identifier) + ".")
+        versions.setdefault(var, []).append(version)
+        return version
+
+    # A negative entry leaves block ~index and drops the versions it made.
+    work, defined = [cfg.ENTRY], []
+    while work:
+        index = work.pop()
+        if index < 0:
+            for var in defined.pop():
+                versions[var].pop()
+            continue
+        block, variables, instructions = blocks[index], [], []
+        for instruction in block.instructions:
+            if instruction.__class__ is asdl.PhiTACKY:
+                var = instruction.dst
+                instruction.dst = new_version(var)
+            else:
+                var = tacky.operands(instruction)[1]
+                # Rewriting the operands makes a new instruction whenever
+                # there is a destination, so it can be updated in place.
+                instruction = tacky.REPLACE_OPERANDS(instruction, current)
+                if var is not None and not static[var.identifier]:
+                    instruction.dst = new_version(var)
+                else:
+                    var = None
+            if var is not None:
+                variables.append(var)
+            instructions.append(instruction)
+        block.instructions = instructions
+        for successor in block.successors:
+            for var, phi in phis.get(successor, ()):
+                phi.args[phi.predecessors.index(index)] = current(var)
+        defined.append(variables)
+        work.append(~index)
+        work += children[index]
+
+
+def destruct(graph, context):
+    # Each phi becomes copies at the end of its predecessors, through a new
+    # block on edges from blocks with other successors (critical edges) or
+    # from ENTRY, which holds no instructions.
+    blocks, control = graph.blocks, graph.control
+    ids = graph.block_ids()
+    # Blocks for jump edges go after the last block that cannot fall
+    # through, where nothing falls into them.
+    anchor = next(
+        index
+        for index in reversed(ids)
+        if (entry := control[blocks[index].instructions[-1].__class__]) is not None
+        and entry[0] in (cfg.JUMP, cfg.RETURN)
+    )
+    for index in ids:
+        block = blocks[index]
+        start = 0 if graph.label(index) is None else 1
+        end = start
+        while end < len(block.instructions) and (
+            block.instructions[end].__class__ is asdl.PhiTACKY
+        ):
+            end += 1
+        if end == start:
+            continue
+        phis = block.instructions[start:end]
+        del block.instructions[start:end]
+        for predecessor in block.predecessors[:]:
+            copies = [
+                (phi.dst, phi.args[phi.predecessors.index(predecessor)]) for phi in phis
+            ]
+            copies = sequentialize(copies, context)
+            if not copies:
+                continue
+            if predecessor == cfg.ENTRY or len(blocks[predecessor].successors) > 1:
+                split_edge(graph, predecessor, index, copies, anchor, context)
+            else:
+                # Passes on SSA form may have emptied the block.
+                instructions = blocks[predecessor].instructions
+                entry = control[instructions[-1].__class__] if instructions else None
+                at = len(instructions) - (entry is not None and entry[0] == cfg.JUMP)
+                instructions[at:at] = copies
+
+
+def split_edge(graph, source, destination, copies, anchor, context):
+    if source != cfg.ENTRY:
+        last = graph.blocks[source].instructions[-1]
+        target = graph.control[last.__class__][1](last)
+    if source != cfg.ENTRY and graph.labels[target] == destination:
+        label = context.labels.fresh("split")
+        index = graph.insert_block(
+            anchor,
+            [asdl.LabelTACKY(label), *copies, asdl.JumpTACKY(target)],
+        )
+        graph.blocks[source].instructions[-1] = last.__class__(last.condition, label)
+    else:
+        # The edge falls through, so the new block goes in between.
+        index = graph.insert_block(source, copies)
+    graph.remove_edge(source, destination)
+    graph.add_edge(source, index)
+    graph.add_edge(index, destination)
+
+
+def sequentialize(copies, context):
+    # Orders copies that take effect at the same time.  A destination can be
+    # written once no pending copy still reads it; when every pending
+    # destination is still read, they form cycles, and the value of one of
+    # them is moved to a new variable first.
+    pending = {dst: src for dst, src in copies if dst != src}
+    reads, moved, result = {}, {}, []
+    for src in pending.values():
+        reads[src] = reads.get(src, 0) + 1
+    ready = [dst for dst in pending if not reads.get(dst)]
+    todo = list(pending)
+    while pending:
+        while ready:
+            dst = ready.pop()
+            src = pending.pop(dst)
+            result.append(asdl.CopyTACKY(moved.get(src, src), dst))
+            reads[src] -= 1
+            if not reads[src] and src in pending:
+                ready.append(src)
+        while todo and todo[-1] not in pending:
+            todo.pop()
+        if todo:
+            dst = todo[-1]
+            saved = context.new_variable("ssa.")
+            result.append(asdl.CopyTACKY(dst, saved))
+            moved[dst] = saved
+            ready.append(dst)
+    return result
@@ -14,40 +14,38 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import asdl
+import names
+import visitor
 
 
 class G:
     def __init__(self):
-        self.temp_vars = self._mk_inc("tmp.")
-        self.and_false = self._mk_inc("and_false")
-        self.or_true = self._mk_inc("or_true")
-        self.end = self._mk_inc("end")
-        self.else_ = self._mk_inc("else")
-        self.e2 = self._mk_inc("e2_")
-
-    def _mk_inc(self, prefix):
-        count = 0
-        while True:
-            yield f"{prefix}{count}"
-            count += 1
+        self.variables = names.Interner()
+        self.labels = names.Interner()
 
     def make_temp_vars(self):
-        return next(self.temp_vars)
+        return self.variables.fresh("tmp.")
 
     def make_and_false_label(self):
-        return next(self.and_false)
+        return self.labels.fresh("and_false")
 
     def make_or_true_label(self):
-        return next(self.or_true)
+        return self.labels.fresh("or_true")
 
     def make_end_label(self):
-        return next(self.end)
+        return self.labels.fresh("end")
 
     def make_else_label(self):
-        return next(self.else_)
+        return self.labels.fresh("else")
 
     def make_e2_label(self):
-        return next(self.e2)
+        return self.labels.fresh("e2_")
+
+    def var(self, identifier):
+        return asdl.VarTACKY(self.variables.intern(identifier))
+
+    def label(self, label, prefix=""):
+        return self.labels.intern(prefix, label)
 
 
 def convert(tree, symbols):
@@ -59,126 +57,133 @@ def convert_program(tree, symbols):
     for declaration in tree.declarations:
         if isinstance(declaration, asdl.FuncDeclAST) and declaration.body:
             convert_function_declaration(g, declaration, symbols, top_level)
-    return asdl.ProgramTACKY(top_level + convert_symbols_to_tacky(symbols))
+    return asdl.ProgramTACKY(
+        top_level + convert_symbols_to_tacky(symbols),
+        g.variables.table,
+        g.labels.table,
+    )
 
 
 def convert_function_declaration(g, node, symbols, top_level):
     instructions = []
-    convert_block(g, node.body, instructions, top_level)
+    CONVERT.walk(node.body, g, instructions, top_level)
     instructions.append(asdl.ReturnTACKY(asdl.ConstantTACKY(0)))
-    name = node.name
+    name, params = node.name, [g.variables.intern(p) for p in node.params]
     top_level.append(
-        asdl.FunctionTACKY(name, symbols[name].attrs.globl, node.params, instructions)
+        asdl.FunctionTACKY(name, symbols[name].attrs.globl, params, instructions)
     )
 
 
-def convert_block(g, block, instructions, top_level):
-    for block_item in block.items:
-        if r := convert_block_item(g, block_item, top_level):
-            instructions.extend(r)
+BREAK_PREFIX, CONTINUE_PREFIX = "break_", "continue_"
 
 
-def convert_block_item(g, node, top_level):
-    match node:
-        case asdl.SAST(statement):
-            return convert_statement(g, statement, top_level)
-        case asdl.DAST(asdl.VarDeclAST()):
-            instructions, is_top_level = convert_variable_declaration(
-                g, node.declaration
-            )
-            if is_top_level:
-                top_level.extend(instructions)
-                instructions.clear()
-            return instructions
+def convert_block(block, g, instructions, top_level):
+    yield from block.items
 
 
-def convert_statement(g, node, top_level):
-    break_prefix, continue_prefix = "break_", "continue_"
-    instructions = []
-    match node:
-        case asdl.ReturnAST(e):
-            v = emit_tacky(g, e, instructions)
-            instructions.append(asdl.ReturnTACKY(v))
-        case asdl.ExpressionAST(e):
-            emit_tacky(g, e, instructions)
-        case asdl.IfAST(condition, then, else_):
-            if else_:
-                else_label = g.make_else_label()
-            end_label = g.make_end_label()
-            c = emit_tacky(g, condition, instructions)
-            instructions.append(
-                asdl.JumpIfZeroTACKY(c, else_label if else_ else end_label)
-            )
-            instructions.extend(convert_statement(g, then, top_level))
-            if else_:
-                instructions += (
-                    asdl.JumpTACKY(end_label),
-                    asdl.LabelTACKY(else_label),
-                )
-                instructions.extend(convert_statement(g, else_, top_level))
-            instructions.append(asdl.LabelTACKY(end_label))
-        case asdl.CompoundAST(block):
-            convert_block(g, block, instructions, top_level)
-        case asdl.BreakAST(label):
-            instructions.append(asdl.JumpTACKY(break_prefix + label))
-        case asdl.ContinueAST(label):
-            instructions.append(asdl.JumpTACKY(continue_prefix + label))
-        case asdl.WhileAST(condition, body, label):
-            continue_label = continue_prefix + label
-            instructions.append(asdl.LabelTACKY(continue_label))
-            c = emit_tacky(g, condition, instructions)
-            break_label = break_prefix + label
-            instructions.append(asdl.JumpIfZeroTACKY(c, break_label))
-            instructions.extend(convert_statement(g, body, top_level))
-            instructions += (
-                asdl.JumpTACKY(continue_label),
-                asdl.LabelTACKY(break_label),
-            )
-        case asdl.DoWhileAST(body, condition, label):
-            instructions.append(asdl.LabelTACKY(label))
-            instructions.extend(convert_statement(g, body, top_level))
-            instructions.append(asdl.LabelTACKY(continue_prefix + label))
-            c = emit_tacky(g, condition, instructions)
-            instructions += (
-                asdl.JumpIfNotZeroTACKY(c, label),
-                asdl.LabelTACKY(break_prefix + label),
-            )
-        case asdl.ForAST(init, condition, post, body, label):
-            match init:
-                case asdl.InitDeclAST(d):
-                    items, is_top_level = convert_variable_declaration(g, d)
-                    if is_top_level:
-                        top_level.extend(items)
-                    else:
-                        instructions.extend(items)
-                case asdl.InitExpAST(e):
-                    emit_tacky(g, e, instructions)
-            instructions.append(asdl.LabelTACKY(label))
-            break_label = break_prefix + label
-            if condition:
-                c = emit_tacky(g, condition, instructions)
-                instructions.append(asdl.JumpIfZeroTACKY(c, break_label))
-            instructions.extend(convert_statement(g, body, top_level))
-            continue_label = continue_prefix + label
-            instructions.append(asdl.LabelTACKY(continue_label))
-            emit_tacky(g, post, instructions)
-            instructions += (
-                asdl.JumpTACKY(label),
-                asdl.LabelTACKY(break_label),
-            )
-    return instructions
+def convert_s(node, g, instructions, top_level):
+    yield node.statement
 
 
-def convert_variable_declaration(g, node):
-    instructions = []
+def convert_d(node, g, instructions, top_level):
+    if isinstance(declaration := node.declaration, asdl.VarDeclAST):
+        yield declaration
+
+
+def convert_return(node, g, instructions, top_level):
+    v = yield node.exp
+    instructions.append(asdl.ReturnTACKY(v))
+
+
+def convert_expression(node, g, instructions, top_level):
+    yield node.exp
+
+
+def convert_if(node, g, instructions, top_level):
+    if else_ := node.else_:
+        else_label = g.make_else_label()
+    end_label = g.make_end_label()
+    c = yield node.condition
+    instructions.append(asdl.JumpIfZeroTACKY(c, else_label if else_ else end_label))
+    yield node.then
+    if else_:
+        instructions += (
+            asdl.JumpTACKY(end_label),
+            asdl.LabelTACKY(else_label),
+        )
+        yield else_
+    instructions.append(asdl.LabelTACKY(end_label))
+
+
+def convert_break(node, g, instructions, top_level):
+    instructions.append(asdl.JumpTACKY(g.label(node.label, BREAK_PREFIX)))
+
+
+def convert_continue(node, g, instructions, top_level):
+    instructions.append(asdl.JumpTACKY(g.label(node.label, CONTINUE_PREFIX)))
+
+
+def convert_while(node, g, instructions, top_level):
+    label = node.label
+    continue_label = g.label(label, CONTINUE_PREFIX)
+    instructions.append(asdl.LabelTACKY(continue_label))
+    c = yield node.condition
+    break_label = g.label(label, BREAK_PREFIX)
+    instructions.append(asdl.JumpIfZeroTACKY(c, break_label))
+    yield node.body
+    instructions += (
+        asdl.JumpTACKY(continue_label),
+        asdl.LabelTACKY(break_label),
+    )
+
+
+def convert_do_while(node, g, instructions, top_level):
+    label = node.label
+    start_label = g.label(label)
+    instructions.append(asdl.LabelTACKY(start_label))
+    yield node.body
+    instructions.append(asdl.LabelTACKY(g.label(label, CONTINUE_PREFIX)))
+    c = yield node.condition
+    instructions += (
+        asdl.JumpIfNotZeroTACKY(c, start_label),
+        asdl.LabelTACKY(g.label(label, BREAK_PREFIX)),
+    )
+
+
+def convert_for(node, g, instructions, top_level):
+    label = node.label
+    match node.init:
+        case asdl.InitDeclAST(d):
+            yield d
+        case asdl.InitExpAST(e):
+            yield e
+    start_label = g.label(label)
+    instructions.append(asdl.LabelTACKY(start_label))
+    break_label = g.label(label, BREAK_PREFIX)
+    if condition := node.condition:
+        c = yield condition
+        instructions.append(asdl.JumpIfZeroTACKY(c, break_label))
+    yield node.body
+    continue_label = g.label(label, CONTINUE_PREFIX)
+    instructions.append(asdl.LabelTACKY(continue_label))
+    yield node.post
+    instructions += (
+        asdl.JumpTACKY(start_label),
+        asdl.LabelTACKY(break_label),
+    )
+
+
+def convert_compound(node, g, instructions, top_level):
+    yield node.block
+
+
+def convert_variable_declaration(node, g, instructions, top_level):
+    # Static locals are initialized in place of their definition.
+    if node.storage_class == asdl.StorageClassAST.STATIC:
+        instructions = top_level
     if init := node.init:
-        v = emit_tacky(g, init, instructions)
-        instructions.append(asdl.CopyTACKY(v, asdl.VarTACKY(node.name)))
-    if (
-        storage_class := node.storage_class
-    ) and storage_class == asdl.StorageClassAST.STATIC:
-        return instructions, True
-    return instructions, False
+        v = yield init, g, instructions, top_level
+        instructions.append(asdl.CopyTACKY(v, g.var(node.name)))
 
 
 def convert_unop(unop):
@@ -217,89 +222,119 @@ def convert_binop(binop):
             return asdl.BinaryOperatorTACKY.GREATER_OR_EQUAL
 
 
-def emit_tacky(g, exp, instructions):
-    match exp:
-        case asdl.ConstantAST(int):
-            return asdl.ConstantTACKY(int)
-        case asdl.VarAST(v):
-            return asdl.VarTACKY(v)
-        case asdl.UnaryAST(op, inner):
-            src = emit_tacky(g, inner, instructions)
+def emit_constant(exp, g, instructions, top_level):
+    return asdl.ConstantTACKY(exp.int)
+
+
+def emit_var(exp, g, instructions, top_level):
+    return g.var(exp.identifier)
+
+
+def emit_unary(exp, g, instructions, top_level):
+    src = yield exp.exp
+    dst = asdl.VarTACKY(g.make_temp_vars())
+    instructions.append(asdl.UnaryTACKY(convert_unop(exp.op), src, dst))
+    return dst
+
+
+def emit_binary(exp, g, instructions, top_level):
+    v1 = yield exp.lhs
+    match op := exp.op:
+        case asdl.BinaryOperatorAST.AND:
+            end_label, false_label = (
+                g.make_end_label(),
+                g.make_and_false_label(),
+            )
+            instructions.append(asdl.JumpIfZeroTACKY(v1, false_label))
+            v2 = yield exp.rhs
             dst = asdl.VarTACKY(g.make_temp_vars())
-            instructions.append(asdl.UnaryTACKY(convert_unop(op), src, dst))
-            return dst
-        case asdl.BinaryAST(op, e1, e2):
-            v1 = emit_tacky(g, e1, instructions)
-            match op:
-                case asdl.BinaryOperatorAST.AND:
-                    end_label, false_label = (
-                        g.make_end_label(),
-                        g.make_and_false_label(),
-                    )
-                    instructions.append(asdl.JumpIfZeroTACKY(v1, false_label))
-                    v2 = emit_tacky(g, e2, instructions)
-                    dst = asdl.VarTACKY(g.make_temp_vars())
-                    instructions += (
-                        asdl.JumpIfZeroTACKY(v2, false_label),
-                        asdl.CopyTACKY(asdl.ConstantTACKY(1), dst),
-                        asdl.JumpTACKY(end_label),
-                        asdl.LabelTACKY(false_label),
-                        asdl.CopyTACKY(asdl.ConstantTACKY(0), dst),
-                        asdl.LabelTACKY(end_label),
-                    )
-                case asdl.BinaryOperatorAST.OR:
-                    end_label, true_label = g.make_end_label(), g.make_or_true_label()
-                    instructions.append(asdl.JumpIfNotZeroTACKY(v1, true_label))
-                    v2 = emit_tacky(g, e2, instructions)
-                    dst = asdl.VarTACKY(g.make_temp_vars())
-                    instructions += (
-                        asdl.JumpIfNotZeroTACKY(v2, true_label),
-                        asdl.CopyTACKY(asdl.ConstantTACKY(0), dst),
-                        asdl.JumpTACKY(end_label),
-                        asdl.LabelTACKY(true_label),
-                        asdl.CopyTACKY(asdl.ConstantTACKY(1), dst),
-                        asdl.LabelTACKY(end_label),
-                    )
-                case _:
-                    v2 = emit_tacky(g, e2, instructions)
-                    dst = asdl.VarTACKY(g.make_temp_vars())
-                    instructions.append(
-                        asdl.BinaryTACKY(convert_binop(op), v1, v2, dst)
-                    )
-            return dst
-        case asdl.AssignmentAST(asdl.VarAST(v), rhs):
-            result = emit_tacky(g, rhs, instructions)
-            lhs = asdl.VarTACKY(v)
-            instructions.append(asdl.CopyTACKY(result, lhs))
-            return lhs
-        case asdl.ConditionalAST(condition, e1, e2):
-            end_label, e2_label = g.make_end_label(), g.make_e2_label()
-            result = asdl.VarTACKY(g.make_temp_vars())
-            c = emit_tacky(g, condition, instructions)
-            instructions.append(asdl.JumpIfZeroTACKY(c, e2_label))
-            v1 = emit_tacky(g, e1, instructions)
             instructions += (
-                asdl.CopyTACKY(v1, result),
+                asdl.JumpIfZeroTACKY(v2, false_label),
+                asdl.CopyTACKY(asdl.ConstantTACKY(1), dst),
                 asdl.JumpTACKY(end_label),
-                asdl.LabelTACKY(e2_label),
+                asdl.LabelTACKY(false_label),
+                asdl.CopyTACKY(asdl.ConstantTACKY(0), dst),
+                asdl.LabelTACKY(end_label),
             )
-            v2 = emit_tacky(g, e2, instructions)
+        case asdl.BinaryOperatorAST.OR:
+            end_label, true_label = g.make_end_label(), g.make_or_true_label()
+            instructions.append(asdl.JumpIfNotZeroTACKY(v1, true_label))
+            v2 = yield exp.rhs
+            dst = asdl.VarTACKY(g.make_temp_vars())
             instructions += (
-                asdl.CopyTACKY(v2, result),
+                asdl.JumpIfNotZeroTACKY(v2, true_label),
+                asdl.CopyTACKY(asdl.ConstantTACKY(0), dst),
+                asdl.JumpTACKY(end_label),
+                asdl.LabelTACKY(true_label),
+                asdl.CopyTACKY(asdl.ConstantTACKY(1), dst),
                 asdl.LabelTACKY(end_label),
             )
-            return result
-        case asdl.FunctionCallAST(name, args):
-            args = [emit_tacky(g, arg, instructions) for arg in args]
+        case _:
+            v2 = yield exp.rhs
             dst = asdl.VarTACKY(g.make_temp_vars())
-            instructions.append(
-                asdl.FunCallTACKY(
-                    name,
-                    args,
-                    dst,
-                )
-            )
-            return dst
+            instructions.append(asdl.BinaryTACKY(convert_binop(op), v1, v2, dst))
+    return dst
+
+
+def emit_assignment(exp, g, instructions, top_level):
+    result = yield exp.rhs
+    lhs = g.var(exp.lhs.identifier)
+    instructions.append(asdl.CopyTACKY(result, lhs))
+    return lhs
+
+
+def emit_conditional(exp, g, instructions, top_level):
+    end_label, e2_label = g.make_end_label(), g.make_e2_label()
+    result = asdl.VarTACKY(g.make_temp_vars())
+    c = yield exp.condition
+    instructions.append(asdl.JumpIfZeroTACKY(c, e2_label))
+    v1 = yield exp.e1
+    instructions += (
+        asdl.CopyTACKY(v1, result),
+        asdl.JumpTACKY(end_label),
+        asdl.LabelTACKY(e2_label),
+    )
+    v2 = yield exp.e2
+    instructions += (
+        asdl.CopyTACKY(v2, result),
+        asdl.LabelTACKY(end_label),
+    )
+    return result
+
+
+def emit_function_call(exp, g, instructions, top_level):
+    args = []
+    for arg in exp.args:
+        args.append((yield arg))
+    dst = asdl.VarTACKY(g.make_temp_vars())
+    instructions.append(asdl.FunCallTACKY(exp.name, args, dst))
+    return dst
+
+
+CONVERT = visitor.Visitor(
+    {
+        asdl.BlockAST: convert_block,
+        asdl.SAST: convert_s,
+        asdl.DAST: convert_d,
+        asdl.VarDeclAST: convert_variable_declaration,
+        asdl.ReturnAST: convert_return,
+        asdl.ExpressionAST: convert_expression,
+        asdl.IfAST: convert_if,
+        asdl.BreakAST: convert_break,
+        asdl.ContinueAST: convert_continue,
+        asdl.WhileAST: convert_while,
+        asdl.DoWhileAST: convert_do_while,
+        asdl.ForAST: convert_for,
+        asdl.CompoundAST: convert_compound,
+        asdl.ConstantAST: emit_constant,
+        asdl.VarAST: emit_var,
+        asdl.UnaryAST: emit_unary,
+        asdl.BinaryAST: emit_binary,
+        asdl.AssignmentAST: emit_assignment,
+        asdl.ConditionalAST: emit_conditional,
+        asdl.FunctionCallAST: emit_function_call,
+    }
+)
 
 
 def convert_symbols_to_tacky(symbols):
@@ -313,3 +348,78 @@ def convert_symbols_to_tacky(symbols):
                     case asdl.TentativeTC():
                         tacky_defs.append(asdl.StaticVariableTACKY(name, globl, 0))
     return tacky_defs
+
+
+def static_variables(variables, symbols):
+    interner = names.Interner(variables)
+    static = bytearray(len(variables.prefixes))
+    for name, entry in symbols.items():
+        if (
+            isinstance(entry.attrs, asdl.StaticAttrTC)
+            and (id := interner.lookup(name)) is not None
+        ):
+            static[id] = 1
+    return static
+
+
+def operands(instruction):
+    # The values an instruction reads, and the one it writes.
+    cls = instruction.__class__
+    if cls is asdl.BinaryTACKY:
+        return (instruction.src1, instruction.src2), instruction.dst
+    if cls is asdl.UnaryTACKY or cls is asdl.CopyTACKY:
+        return (instruction.src,), instruction.dst
+    if cls is asdl.FunCallTACKY or cls is asdl.PhiTACKY:
+        return instruction.args, instruction.dst
+    if cls is asdl.ReturnTACKY:
+        return (instruction.val,), None
+    if cls is asdl.JumpIfZeroTACKY or cls is asdl.JumpIfNotZeroTACKY:
+        return (instruction.condition,), None
+    return (), None
+
+
+def replace_return(instruction, source):
+    return asdl.ReturnTACKY(source(instruction.val))
+
+
+def replace_unary(instruction, source):
+    i = instruction
+    return asdl.UnaryTACKY(i.op, source(i.src), i.dst)
+
+
+def replace_binary(instruction, source):
+    i = instruction
+    return asdl.BinaryTACKY(i.op, source(i.src1), source(i.src2), i.dst)
+
+
+def replace_copy(instruction, source):
+    return asdl.CopyTACKY(source(instruction.src), instruction.dst)
+
+
+def replace_condition(instruction, source):
+    return instruction.__class__(source(instruction.condition), instruction.target)
+
+
+def replace_function_call(instruction, source):
+    i = instruction
+    return asdl.FunCallTACKY(i.fun_name, [source(arg) for arg in i.args], i.dst)
+
+
+def replace_phi(instruction, source):
+    i = instruction
+    return asdl.PhiTACKY(i.dst, [source(arg) for arg in i.args], i.predecessors[:])
+
+
+REPLACE_OPERANDS = visitor.Visitor(
+    {
+        asdl.ReturnTACKY: replace_return,
+        asdl.UnaryTACKY: replace_unary,
+        asdl.BinaryTACKY: replace_binary,
+        asdl.CopyTACKY: replace_copy,
+        asdl.JumpIfZeroTACKY: replace_condition,
+        asdl.JumpIfNotZeroTACKY: replace_condition,
+        asdl.FunCallTACKY: replace_function_call,
+        asdl.PhiTACKY: replace_phi,
+    },
+    visitor.keep,
+)
@@ -0,0 +1,240 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from array import array
+from collections.abc import Sequence
+
+import asdl
+
+# An opcode is an instruction class together with its operator, if any.
+OPCODES = (
+    (asdl.ReturnTACKY, None),
+    *((asdl.UnaryTACKY, op) for op in asdl.UnaryOperatorTACKY),
+    *((asdl.BinaryTACKY, op) for op in asdl.BinaryOperatorTACKY),
+    (asdl.CopyTACKY, None),
+    (asdl.JumpTACKY, None),
+    (asdl.JumpIfZeroTACKY, None),
+    (asdl.JumpIfNotZeroTACKY, None),
+    (asdl.LabelTACKY, None),
+    (asdl.FunCallTACKY, None),
+    (asdl.PhiTACKY, None),
+)
+OPCODE = {entry: opcode for opcode, entry in enumerate(OPCODES)}
+NO_ID = -1
+
+
+class PackedFunctionTACKY:
+    # Instruction i is (opcodes[i], src1[i], src2[i], dst[i], label[i]).
+    # Operand ids index operands, label slots index strings (label ids and
+    # callee names).  A FunCallTACKY keeps its arguments in args[src1 : src1 + src2];
+    # a PhiTACKY keeps its arguments there too, followed by its predecessors.
+    def __init__(self, identifier, globl, params):
+        self.identifier = identifier
+        self.globl = globl
+        self.params = params
+        self.opcodes = array("B")
+        self.src1 = array("i")
+        self.src2 = array("i")
+        self.dst = array("i")
+        self.label = array("i")
+        self.args = array("i")
+        self.operands = []
+        self.strings = []
+        self._operand_ids = {}
+        self._string_ids = {}
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __eq__(self, o):
+        return (
+            isinstance(o, PackedFunctionTACKY)
+            and (self.identifier, self.globl, self.params)
+            == (o.identifier, o.globl, o.params)
+            and list(self.body) == list(o.body)
+        )
+
+    @property
+    def body(self):
+        return InstructionView(self)
+
+    def operand_id(self, val):
+        match val:
+            case asdl.ConstantTACKY(i):
+                key = (asdl.ConstantTACKY, i)
+            case asdl.VarTACKY(identifier):
+                key = (asdl.VarTACKY, identifier)
+        if (operand_id := self._operand_ids.get(key)) is None:
+            operand_id = self._operand_ids[key] = len(self.operands)
+            self.operands.append(val)
+        return operand_id
+
+    def string_id(self, s):
+        if (string_id := self._string_ids.get(s)) is None:
+            string_id = self._string_ids[s] = len(self.strings)
+            self.strings.append(s)
+        return string_id
+
+    def _append(self, opcode, src1=NO_ID, src2=NO_ID, dst=NO_ID, label=NO_ID):
+        self.opcodes.append(opcode)
+        self.src1.append(src1)
+        self.src2.append(src2)
+        self.dst.append(dst)
+        self.label.append(label)
+
+    def append(self, instruction):
+        operand_id, string_id = self.operand_id, self.string_id
+        match instruction:
+            case asdl.ReturnTACKY(val):
+                self._append(OPCODE[asdl.ReturnTACKY, None], operand_id(val))
+            case asdl.UnaryTACKY(op, src, dst):
+                self._append(
+                    OPCODE[asdl.UnaryTACKY, op], operand_id(src), dst=operand_id(dst)
+                )
+            case asdl.BinaryTACKY(op, src1, src2, dst):
+                self._append(
+                    OPCODE[asdl.BinaryTACKY, op],
+                    operand_id(src1),
+                    operand_id(src2),
+                    operand_id(dst),
+                )
+            case asdl.CopyTACKY(src, dst):
+                self._append(
+                    OPCODE[asdl.CopyTACKY, None], operand_id(src), dst=operand_id(dst)
+                )
+            case asdl.JumpTACKY(target) | asdl.LabelTACKY(target):
+                self._append(
+                    OPCODE[instruction.__class__, None], label=string_id(target)
+                )
+            case asdl.JumpIfZeroTACKY(condition, target) | asdl.JumpIfNotZeroTACKY(
+                condition, target
+            ):
+                self._append(
+                    OPCODE[instruction.__class__, None],
+                    operand_id(condition),
+                    label=string_id(target),
+                )
+            case asdl.FunCallTACKY(fun_name, args, dst):
+                start = len(self.args)
+                self.args.extend(map(operand_id, args))
+                self._append(
+                    OPCODE[asdl.FunCallTACKY, None],
+                    start,
+                    len(args),
+                    operand_id(dst),
+                    string_id(fun_name),
+                )
+            case asdl.PhiTACKY(dst, args, predecessors):
+                start = len(self.args)
+                self.args.extend(map(operand_id, args))
+                self.args.extend(predecessors)
+                self._append(
+                    OPCODE[asdl.PhiTACKY, None], start, len(args), operand_id(dst)
+                )
+            case _:
+                raise TypeError(f"Cannot pack {instruction.__class__.__name__}")
+
+    def instruction(self, index):
+        cls, op = OPCODES[self.opcodes[index]]
+        operands, strings = self.operands, self.strings
+        src1, dst = self.src1[index], self.dst[index]
+        match cls:
+            case asdl.ReturnTACKY:
+                return asdl.ReturnTACKY(operands[src1])
+            case asdl.UnaryTACKY:
+                return asdl.UnaryTACKY(op, operands[src1], operands[dst])
+            case asdl.BinaryTACKY:
+                src2 = operands[self.src2[index]]
+                return asdl.BinaryTACKY(op, operands[src1], src2, operands[dst])
+            case asdl.CopyTACKY:
+                return asdl.CopyTACKY(operands[src1], operands[dst])
+            case asdl.JumpTACKY | asdl.LabelTACKY:
+                return cls(strings[self.label[index]])
+            case asdl.JumpIfZeroTACKY | asdl.JumpIfNotZeroTACKY:
+                return cls(operands[src1], strings[self.label[index]])
+            case asdl.FunCallTACKY:
+                args = self.args[src1 : src1 + self.src2[index]]
+                return asdl.FunCallTACKY(
+                    strings[self.label[index]],
+                    [operands[arg] for arg in args],
+                    operands[dst],
+                )
+            case asdl.PhiTACKY:
+                n = self.src2[index]
+                args = self.args[src1 : src1 + n]
+                return asdl.PhiTACKY(
+                    operands[dst],
+                    [operands[arg] for arg in args],
+                    list(self.args[src1 + n : src1 + 2 * n]),
+                )
+
+
+class InstructionView(Sequence):
+    # Materializes instruction objects on access; changes to them are not
+    # written back.
+    def __init__(self, function):
+        self._function = function
+
+    def __len__(self):
+        return len(self._function)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._function.instruction(index)
+
+    def __iter__(self):
+        instruction = self._function.instruction
+        for index in range(len(self)):
+            yield instruction(index)
+
+
+def pack_function(function):
+    packed = PackedFunctionTACKY(function.identifier, function.globl, function.params)
+    for instruction in function.body:
+        packed.append(instruction)
+    return packed
+
+
+def unpack_function(packed):
+    return asdl.FunctionTACKY(
+        packed.identifier, packed.globl, packed.params, list(packed.body)
+    )
+
+
+def pack(tree):
+    return asdl.ProgramTACKY(
+        [
+            pack_function(item) if isinstance(item, asdl.FunctionTACKY) else item
+            for item in tree.top_level
+        ],
+        tree.variables,
+        tree.labels,
+    )
+
+
+def unpack(tree):
+    return asdl.ProgramTACKY(
+        [
+            unpack_function(item) if isinstance(item, PackedFunctionTACKY) else item
+            for item in tree.top_level
+        ],
+        tree.variables,
+        tree.labels,
+    )
@@ -0,0 +1,76 @@
+# Copyright (C) 2024 gh-nate
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from types import GeneratorType
+
+
+def ignore(node, *args):
+    return None
+
+
+def keep(node, *args):
+    return node
+
+
+class HandlerTable(dict):
+    # Maps a node class to its handler.  A class without an entry of its own
+    # takes the handler of its nearest base class, resolved once and cached.
+    def __init__(self, handlers, default=ignore):
+        super().__init__(handlers)
+        self.default = default
+
+    def __missing__(self, cls):
+        for base in cls.__mro__[1:]:
+            if (handler := dict.get(self, base)) is not None:
+                break
+        else:
+            handler = self.default
+        self[cls] = handler
+        return handler
+
+
+class Visitor:
+    # A handler is called as handler(node, *args).  A plain function handles
+    # its node on its own.  A generator function visits children by yielding
+    # them, either as a bare node that is visited with the same arguments or
+    # as a (node, *args) tuple, and receives each child's result back from
+    # the yield; its return value is the node's result.
+    def __init__(self, handlers, default=ignore):
+        self.handlers = HandlerTable(handlers, default)
+
+    def __call__(self, node, *args):
+        return self.handlers[node.__class__](node, *args)
+
+    def walk(self, node, *args):
+        # Generators are resumed from an explicit stack, so the depth of the
+        # tree is not limited by the recursion limit.
+        handlers, frames = self.handlers, []
+        value = handlers[node.__class__](node, *args)
+        while True:
+            if value.__class__ is GeneratorType:
+                frames.append((value, args))
+                value = None
+            elif not frames:
+                return value
+            generator, args = frames[-1]
+            try:
+                child = generator.send(value)
+            except StopIteration as stop:
+                frames.pop()
+                value = stop.value
+                continue
+            if child.__class__ is tuple:
+                child, *args = child
+            value = handlers[child.__class__](child, *args)